@@ -1,19 +1,23 @@
 import json
 import subprocess
+from io import BytesIO
 import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 
 import httpx
+import soundfile as sf
 from fastapi.exceptions import RequestValidationError
 from fastapi.openapi.utils import get_openapi
 from sqlalchemy.sql import true
 from starlette.requests import Request
-from starlette.responses import FileResponse, JSONResponse
+from starlette.responses import FileResponse, JSONResponse, Response
 
 from server.auth import get_session, is_admin
+from server.circular_buffer import attach_audio_buffer
+from server.rip_tool.audio_data import read_window
 from server.models import ResponseModel, LyricLine, Lyrics
-from server.utils import safe_filename
+from server.utils import safe_filename, normalize
 from server.config import ClientConfig, FileConfig, env_config
 from server.exceptions import ErrorResponse
 
@@ -22,7 +26,7 @@ sys.path.append(str(Path(__file__).parents))
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from server.redis_client import get_redis
+from server.redis_client import get_redis, wake
 from server.routes import status, history, rip_tool, auth, settings
 from server.routes.status import get_status
 
@@ -45,35 +49,38 @@ app.include_router(settings.api)
 @app.post("/api/scan-now")
 def scan_now(request: Request) -> ResponseModel:
     if is_admin(request):
-        rdb = get_redis()
-        rdb.delete("sleep.next_scan")
+        wake("next_scan")
         return ResponseModel(success=True, status="")
     else:
         raise ErrorResponse(403, "not_authorized")
 
 
 @app.get("/api/dump", response_model=None)
-async def dump_audio(request: Request, mins: float = 1) -> ResponseModel | FileResponse:
+def dump_audio(request: Request, mins: float = 1) -> Response:
     if is_admin(request):
-        rdb = get_redis()
-        rdb.publish("dump", f"{float(mins * 60)}")
-
-        ps = rdb.pubsub()
-        ps.subscribe("dump_response")
-        ps.get_message(timeout=1)
-        resp_raw = ps.get_message(timeout=30)
-
-        if resp_raw is None:
-            raise ErrorResponse(500, "timed_out")
-        else:
-            resp = ResponseModel.model_validate_json(resp_raw["data"])
-            if resp.data:
-                return FileResponse(
-                    resp.data,
-                    filename=f"{safe_filename(datetime.now().isoformat())}.flac"
-                )
-            else:
-                return resp
+        # the whole window is decoded into memory, so it can't ask for more than the recorder keeps
+        config = FileConfig.load()
+        max_mins = (config.buffer_length_seconds + config.history_length_seconds) / 60
+        if not 0 < mins <= max_mins:
+            raise ErrorResponse(400, "invalid_duration", f"mins must be above 0 and at most {max_mins:g}")
+
+        try:
+            with attach_audio_buffer() as audio_buffer:
+                _, last_frame_time = audio_buffer.position()
+                raw = read_window(audio_buffer, last_frame_time - mins * 60, last_frame_time)
+                sample_rate = audio_buffer.sample_rate
+        except FileNotFoundError:
+            raise ErrorResponse(503, "recorder_unavailable", "Audio buffer not available")
+
+        flac = BytesIO()
+        sf.write(flac, normalize(raw), sample_rate, format="FLAC")
+
+        filename = f"{safe_filename(datetime.now().isoformat())}.flac"
+        return Response(
+            flac.getvalue(),
+            media_type="audio/flac",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
 
     else:
         raise ErrorResponse(403, "not_authorized")
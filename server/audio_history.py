@@ -0,0 +1,136 @@
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from server.circular_buffer import CircularBuffer
+from server.config import env_config
+from server.logger import logger
+
+
+FORMATS = {
+    "flac": ("FLAC", None, ".flac"),
+    "opus": ("OGG", "OPUS", ".opus"),
+    "vorbis": ("OGG", "VORBIS", ".ogg"),
+}
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+history_dir = env_config.appdata_dir / "history"
+
+
+class AudioHistory:
+    """
+    Audio kept beyond the ring buffer, as fixed-length compressed chunks on disk.
+
+    Each chunk is named after the time it starts and its duration (`<start ms>_<duration ms>.flac`), so the
+    directory listing is the time index, and other processes can read the history without the recorder.
+    """
+
+    def __init__(self, directory: Path, audio_format: str = "flac"):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.format, self.subtype, self.extension = FORMATS[audio_format]
+
+    def append(self, audio: np.ndarray, sample_rate: int, started_at: float):
+        if self.subtype == "OPUS" and sample_rate not in OPUS_SAMPLE_RATES:
+            logger.warning(f"Opus doesn't support {sample_rate} Hz, saving audio history as Vorbis")
+            self.format, self.subtype, self.extension = FORMATS["vorbis"]
+
+        duration_ms = round(len(audio) / sample_rate * 1000)
+        path = self.directory / f"{round(started_at * 1000)}_{duration_ms}{self.extension}"
+        tmp_path = path.with_suffix(".tmp")
+
+        sf.write(tmp_path, audio, sample_rate, format=self.format, subtype=self.subtype)
+        tmp_path.rename(path)  # readers never see a half-written chunk
+
+    def chunks(self) -> list[tuple[float, float, Path]]:
+        """ Returns (started_at, ended_at, path) for every chunk, oldest first. """
+        chunks = []
+        for path in self.directory.iterdir():
+            if path.suffix not in (".flac", ".opus", ".ogg"):
+                continue
+
+            start_ms, duration_ms = path.stem.split("_")
+            chunks.append((int(start_ms) / 1000, (int(start_ms) + int(duration_ms)) / 1000, path))
+
+        return sorted(chunks)
+
+    def prune(self, older_than: float):
+        for started_at, ended_at, path in self.chunks():
+            if ended_at >= older_than:
+                break
+
+            path.unlink(missing_ok=True)
+
+    def read(self, started_at: float, ended_at: float) -> tuple[np.ndarray, int, float] | None:
+        """
+        Decodes the audio between two unix timestamps, touching only the chunks that overlap them. Gaps
+        between chunks are filled with silence.
+
+        Returns (audio, sample_rate, covered_until), where `covered_until` is where the history ends if
+        that is before `ended_at`, or None if there's no history for the window.
+        """
+        chunks = self.chunks()
+        first = max(0, bisect_left([chunk[1] for chunk in chunks], started_at))
+        overlapping = [chunk for chunk in chunks[first:] if chunk[0] < ended_at]
+        if not overlapping:
+            return None
+
+        info = sf.info(str(overlapping[0][2]))
+        sample_rate, channels = info.samplerate, info.channels
+
+        covered_until = min(ended_at, overlapping[-1][1])
+        started_at = max(started_at, overlapping[0][0])
+        out = np.zeros((round((covered_until - started_at) * sample_rate), channels), np.float32)
+
+        for chunk_started_at, chunk_ended_at, path in overlapping:
+            with sf.SoundFile(path) as chunk:
+                if chunk.samplerate != sample_rate or chunk.channels != channels:
+                    continue  # recorded before the audio settings changed
+
+                skip = max(0, round((started_at - chunk_started_at) * sample_rate))
+                offset = max(0, round((chunk_started_at - started_at) * sample_rate))
+                frames = min(chunk.frames - skip, len(out) - offset)
+                if frames <= 0:
+                    continue
+
+                chunk.seek(skip)
+                chunk.read(dtype="float32", always_2d=True, out=out[offset:offset + frames])
+
+        return out, sample_rate, covered_until
+
+
+def run_audio_history(
+        audio_buffer: CircularBuffer,
+        history: AudioHistory,
+        chunk_seconds: float,
+        history_length_seconds: float,
+):
+    """ Encodes audio from the ring buffer into `history` as each chunk completes. """
+    sample_rate = audio_buffer.sample_rate
+    chunk = np.empty((int(chunk_seconds * sample_rate), audio_buffer.channels), np.float32)
+    next_chunk_end = audio_buffer.frames_written + len(chunk)
+
+    while True:
+        head, last_frame_time = audio_buffer.position()
+        if head < next_chunk_end:
+            time.sleep((next_chunk_end - head) / sample_rate + 0.1)
+            continue
+
+        try:
+            if next_chunk_end - len(chunk) < head - audio_buffer.capacity:
+                logger.warning("Audio history fell behind the buffer, skipping ahead")
+                next_chunk_end = head
+                continue
+
+            audio_buffer.read_into(chunk, end=next_chunk_end)
+            chunk_ended_at = last_frame_time - (head - next_chunk_end) / sample_rate
+            history.append(chunk, sample_rate, chunk_ended_at - len(chunk) / sample_rate)
+            history.prune(time.time() - history_length_seconds)
+
+        except Exception as e:
+            logger.warning(f"Failed to save audio history: {e}")
+
+        next_chunk_end += len(chunk)
@@ -1,3 +1,4 @@
+import json
 import sys
 import threading
 from pathlib import Path
@@ -15,21 +16,30 @@ from server import music_id
 from server.config import env_config, file_config
 from server.logger import logger
 from server.last_fm import get_last_fm_track, get_last_fm_artist, get_last_fm_album, extract_track_number_from_last_fm
-from server.redis_client import sleep
 from server.db import save_history_entry, get_history_entries, get_db_track_from_music_id
-from server.utils import utcnow, normalize
-from server.models import ResponseModel, IdentifyResult
-from server.redis_client import get_redis
-from server.db import get_history_entry, update_history_entries
-from server.utils import clamp
-from server.circular_buffer import CircularBuffer
+from server.utils import utcnow
+from server.models import IdentifyResult, MusicIdResult
+from server.redis_client import get_async_redis, get_redis, status_changed
+from server.audio_history import AudioHistory, history_dir, run_audio_history
+from server.capture import CaptureSupervisor
+from server.replay import ReplaySource
+from server.scan_scheduler import ScanScheduler
+from server.id_stream import IdStream
+from server.music_id.continuity import TrackContinuity
+from server.music_id.process_pool import get_process_pool, shutdown_process_pool
+from server.dsp.noise_floor import NoiseFloor
+from server.circular_buffer import (
+    SAMPLE_FORMATS, CircularBuffer, SharedCircularBuffer, DiskCircularBuffer, SharedMemoryTooSmall, disk_buffer_path,
+)
 from server import sql_schemas
 
-buffer_lock = threading.Lock()
-
 
 def get_effective_audio_params():
     """Get effective sample_rate and channels, using device defaults if not specified in config."""
+    if env_config.replay_file:
+        info = sf.info(str(env_config.replay_file))
+        return info.samplerate, info.channels
+
     sample_rate = file_config.sample_rate
     channels = file_config.channels
     
@@ -88,170 +98,230 @@ def get_effective_audio_params():
 # Get effective audio parameters
 effective_sample_rate, effective_channels = get_effective_audio_params()
 buffer_size = effective_sample_rate * file_config.buffer_length_seconds
+buffer_guard_frames = effective_sample_rate * 5  # headroom so full-buffer reads aren't lapped by the writer
+buffer_block_slots = CircularBuffer.default_block_slots(
+    (buffer_size + buffer_guard_frames,),
+    min_block_frames=file_config.blocksize or 256,  # blocksize 0 lets PortAudio pick
+)
 
 
-def audio_capture(audio_buffer: CircularBuffer, timestamp_np: np.ndarray):
-    """ Continuously captures stereo audio and updates shared memory buffer. """
+def get_silence_thresholds(noise_floor: NoiseFloor, is_music: bool) -> tuple[float, float]:
+    """ Returns the (enter, exit) RMS thresholds for scanning, holding the noise floor while `is_music`. """
+    if not file_config.adaptive_silence_threshold:
+        return file_config.silence_threshold, file_config.silence_threshold
 
-    frames = file_config.blocksize
+    noise_floor.update(is_music)
+    return noise_floor.enter_threshold, noise_floor.exit_threshold
 
-    def callback(in_data, n_frames, time_, _status):
-        with buffer_lock:
-            last_frame_time = time_.inputBufferAdcTime + (n_frames / effective_sample_rate)
-            last_frame_time += (time.time() - time_.currentTime)
-            timestamp_np[0] = last_frame_time + file_config.device_offset
-            audio_buffer.write(in_data)
 
-    with sd.InputStream(
-        samplerate=effective_sample_rate,
-        blocksize=frames,
-        channels=effective_channels,
-        device=file_config.device if file_config.device else None,
-        dtype="float32",
-        latency=file_config.latency,
-        callback=callback,
-    ) as stream:
-        logger.info("Recording... Press Ctrl+C to stop.")
-        stream.start()
+# how long each stage of a scan may take before it's given up on
+IDENTIFY_TIMEOUT = 10
+ENRICH_TIMEOUT = 10
+PERSIST_TIMEOUT = 10
 
-        try:
-            while True:
-                pass
 
-        except KeyboardInterrupt:
-            logger.info("\nStopped recording.")
+async def fetch_last_fm(result: IdentifyResult):
+    """ Fills in the Last.fm track, artist and album of an identified track, fetching them in parallel. """
+    async def _get_album():
+        if result.track.album_name:
+            return await get_last_fm_album(
+                result.track.artist_name.split(" & ")[0],
+                result.track.album_name
+            )
+        return None
+
+    result.last_fm_track, result.last_fm_artist, result.last_fm_album = await asyncio.gather(
+        get_last_fm_track(result.track.track_name, result.track.artist_name),
+        get_last_fm_artist(result.track.artist_name.split(" & ")[0]),
+        _get_album(),
+    )
+
+
+def save_track(result: IdentifyResult) -> str:
+    """ Finds or adds the identified track to the database, returning its guid. """
+    db_track = get_db_track_from_music_id(
+        track_id=result.track.track_id,
+        source=result.plugin or file_config.music_id_plugin,
+        track_name=result.track.track_name,
+        artist_name=result.track.artist_name,
+        album_name=result.track.album_name,
+        track_no=result.track.track_no,
+        label=result.track.label,
+        released=result.track.released,
+        track_image=result.track.track_image,
+        artist_image=result.track.artist_image,
+        duration_seconds=result.duration_seconds,
+        last_fm=result.last_fm_track.model_dump() if result.last_fm_track else None,
+    )
+
+    result.duration_seconds = db_track.duration_seconds
+    return db_track.track_guid
 
 
-def run_music_id_loop(audio_buffer: CircularBuffer, timestamp_np: np.ndarray, loop: asyncio.BaseEventLoop):
-    asyncio.set_event_loop(loop)
+async def run_music_id_loop(
+        audio_buffer: CircularBuffer,
+        id_stream: IdStream,
+        noise_floor: NoiseFloor,
+        scheduler: ScanScheduler,
+):
+    """
+    Scans, identifies, enriches and saves tracks as a task on the recorder's event loop. Each stage has its own
+    timeout, and cancelling the task stops it wherever it is.
+    """
+    # reused for every read so the loop doesn't allocate a new clip each time
+    clip_data = np.empty((int(file_config.duration * id_stream.target_rate), 1), np.float32)
 
     back_off = 0.0  # portion of configured duration time to wait before recording again
     duration = 0.7 * file_config.duration  # duration to record for
     subsequent_detects = 0  # number of times the same track has been detected subsequently
     is_waiting = True  # True when waiting for sound, False when actively scanning
+    continuity = TrackContinuity(id_stream.target_rate, file_config.local_confirm_seconds)
 
     while True:
-        rdb = get_redis()
+        rdb = get_async_redis()
 
         try:
             if is_waiting:
                 # Waiting mode: poll every second and check RMS
-                rdb.delete("now_scanning")
-                rdb.set("status", "waiting", px=timedelta(seconds=2))
+                async with rdb.pipeline(transaction=False) as pipe:
+                    pipe.delete("now_scanning")
+                    pipe.set("status", "waiting", px=timedelta(seconds=2))
+                    stopped_scanning, _ = await pipe.execute()
+
+                if stopped_scanning:
+                    await status_changed(rdb)
                 logger.debug("Waiting for sound...")
-                time.sleep(1.0)
+                await asyncio.sleep(1.0)
 
-                with buffer_lock:
-                    # Check RMS of the last 1 second
-                    check_frames = int(1.0 * effective_sample_rate)
-                    audio_data = audio_buffer.read(check_frames)
-                    last_frame_time = timestamp_np[0]
+                # Check RMS of the last 1 second, and that the last few seconds sound like music
+                check_rms = audio_buffer.rms(int(1.0 * effective_sample_rate))
+                activity = id_stream.activity.state
+                enter_threshold, _ = get_silence_thresholds(noise_floor, activity.is_music)
 
-                rms = float(np.sqrt(np.mean(audio_data ** 2)))
-                
-                if rms >= file_config.silence_threshold:
-                    # Sound detected, switch to scanning mode
-                    logger.info(f"Sound detected (RMS: {rms}), starting scan...")
+                if check_rms >= enter_threshold and (activity.is_music or not file_config.music_detection):
+                    # Music detected, switch to scanning mode
+                    logger.info(f"Sound detected (RMS: {check_rms}, music score: {activity.score:.2f}), starting scan...")
                     is_waiting = False
-                    rdb.delete("status")
+                    await rdb.delete("status")
                     # Continue to scanning logic below
                 else:
                     # Still no sound, continue waiting
                     continue
 
+            # the id stream follows the rate of the first plugin, which can change in the settings
+            await music_id.plugin_registry.sync()
+            target_rate = music_id.plugin_registry.sample_rate(effective_sample_rate)
+            if target_rate != id_stream.target_rate:
+                id_stream.retarget(target_rate)
+                clip_data = np.empty((int(file_config.duration * target_rate), 1), np.float32)
+                continuity = TrackContinuity(target_rate, file_config.local_confirm_seconds)
+
             # Scanning mode: perform full music identification
-            rdb.set("now_scanning", (utcnow() + timedelta(seconds=duration)).isoformat())
+            async with rdb.pipeline() as pipe:
+                pipe.set("now_scanning", (utcnow() + timedelta(seconds=duration)).isoformat())
+                status_changed(pipe)
+                await pipe.execute()
             logger.info(f"scanning {duration}s...")
-            time.sleep(duration)
-
-            with buffer_lock:
-                clip_frames = int(duration * effective_sample_rate)
-                audio_data = audio_buffer.read(clip_frames)
-                last_frame_time = timestamp_np[0]
-
-            music_id_result = asyncio.run_coroutine_threadsafe(
-                music_id.recognize_raw(audio_data, effective_sample_rate),
-                loop
-            ).result(10)
-            result = IdentifyResult.model_validate({
-                "recorded_at": datetime.fromtimestamp(last_frame_time - duration, timezone.utc),
-                "rms": float(np.sqrt(np.mean(audio_data ** 2))),
-                **(music_id_result.model_dump()),
-            })
+            await asyncio.sleep(duration)
+
+            # already downmixed and resampled as it was captured
+            audio_data = clip_data[:int(duration * id_stream.target_rate)]
+            last_frame_time = id_stream.clip(audio_data)
+
+            end = min(audio_buffer.frame_at(last_frame_time), audio_buffer.frames_written)
+            clip_rms, _ = audio_buffer.levels(end - int(duration * effective_sample_rate), end)
+            is_music = id_stream.activity.is_music or not file_config.music_detection
+            _, exit_threshold = get_silence_thresholds(noise_floor, is_music=True)  # scanning, so not the room
+            recorded_at = datetime.fromtimestamp(last_frame_time - duration, timezone.utc)
+            changes = id_stream.changes.changes
+
+            # while the same track is evidently still playing, there's no need to ask the plugin again
+            continuity_result = None
+            if is_music and clip_rms >= exit_threshold:
+                continuity_result = continuity.check(audio_data, recorded_at, clip_rms, changes)
+
+            if continuity_result is not None:
+                result = continuity_result
+            else:
+                try:
+                    async with asyncio.timeout(IDENTIFY_TIMEOUT):
+                        music_id_result = await music_id.recognize_raw(
+                            audio_data,
+                            id_stream.target_rate,
+                            clip_rms=clip_rms,
+                            is_music=is_music,
+                            silence_threshold=exit_threshold,
+                        )
+                except TimeoutError:
+                    music_id_result = MusicIdResult(success=False, message=f"Identification timed out after {IDENTIFY_TIMEOUT}s")
 
-            if result.success:
-                result.started_at = (result.recorded_at - timedelta(seconds=result.track.offset)).replace(microsecond=0)
-
-                async def _fetch_meta():
-                    # Fetch all metadata in parallel
-                    async def _get_album():
-                        if result.track.album_name:
-                            return await get_last_fm_album(
-                                result.track.artist_name.split(" & ")[0],
-                                result.track.album_name
-                            )
-                        return None
-                    
-                    result.last_fm_track, result.last_fm_artist, result.last_fm_album = await asyncio.gather(
-                        get_last_fm_track(result.track.track_name, result.track.artist_name),
-                        get_last_fm_artist(result.track.artist_name.split(" & ")[0]),
-                        _get_album(),
-                    )
-
-                asyncio.run_coroutine_threadsafe(_fetch_meta(), loop).result(10)
-
-                if result.track.duration_seconds:
-                    result.duration_seconds = result.track.duration_seconds
-                elif result.last_fm_track and (duration_seconds := result.last_fm_track.duration_seconds):
-                    result.duration_seconds = duration_seconds
-
-                # Extract track number from LastFM data
-                if not result.track.track_no and result.last_fm_track and result.last_fm_album:
-                    track_data = result.last_fm_track.model_dump()
-                    track_no = extract_track_number_from_last_fm(track_data, result.last_fm_album)
-                    result.track.track_no = track_no
-
-
-                db_track = get_db_track_from_music_id(
-                    track_id=result.track.track_id,
-                    source=file_config.music_id_plugin,
-                    track_name=result.track.track_name,
-                    artist_name=result.track.artist_name,
-                    album_name=result.track.album_name,
-                    track_no=result.track.track_no,
-                    label=result.track.label,
-                    released=result.track.released,
-                    track_image=result.track.track_image,
-                    artist_image=result.track.artist_image,
-                    duration_seconds=result.duration_seconds,
-                    last_fm=result.last_fm_track.model_dump(),
-                )
+                result = IdentifyResult.model_validate({
+                    "recorded_at": recorded_at,
+                    "rms": clip_rms,
+                    **(music_id_result.model_dump()),
+                })
 
-                result.duration_seconds = db_track.duration_seconds
+            if result.success:
+                if continuity_result is None:
+                    result.started_at = (result.recorded_at - timedelta(seconds=result.track.offset)).replace(microsecond=0)
+
+                    try:
+                        async with asyncio.timeout(ENRICH_TIMEOUT):
+                            await fetch_last_fm(result)
+                    except TimeoutError:
+                        logger.warning(f"Last.fm didn't answer within {ENRICH_TIMEOUT}s, saving the track without it")
+
+                    if result.track.duration_seconds:
+                        result.duration_seconds = result.track.duration_seconds
+                    elif result.last_fm_track and (duration_seconds := result.last_fm_track.duration_seconds):
+                        result.duration_seconds = duration_seconds
+
+                    # Extract track number from LastFM data
+                    if not result.track.track_no and result.last_fm_track and result.last_fm_album:
+                        track_data = result.last_fm_track.model_dump()
+                        track_no = extract_track_number_from_last_fm(track_data, result.last_fm_album)
+                        result.track.track_no = track_no
+
+                    # the database calls block, so they run on a thread, which carries on after a timeout
+                    async with asyncio.timeout(PERSIST_TIMEOUT):
+                        track_guid = await asyncio.to_thread(save_track, result)
+                    continuity.identified(result, track_guid, audio_data, changes)
+                else:
+                    track_guid = continuity.track_guid
 
                 if result.duration_seconds:
                     remaining_seconds = int(result.duration_seconds - (utcnow() - result.started_at).total_seconds())
                 else:
                     remaining_seconds = 0
 
-                if str(db_track.track_guid) == str(rdb.get("track_id")):
+                if str(track_guid) == str(await rdb.get("track_id")):
                     subsequent_detects += 1
                     if subsequent_detects >= 1:
-
-                        save_history_entry(
-                            track_guid=db_track.track_guid,
-                            detected_at=utcnow(),
-                            started_at=result.started_at,
-                        )
+                        async with asyncio.timeout(PERSIST_TIMEOUT):
+                            await asyncio.to_thread(
+                                save_history_entry,
+                                track_guid=track_guid,
+                                detected_at=utcnow(),
+                                started_at=result.started_at,
+                            )
                 else:
                     subsequent_detects = 0
                     back_off = 0
 
                 expire_after = timedelta(seconds=max(0, remaining_seconds) + (file_config.duration + 5) * 3)
 
-                rdb.set("now_playing", result.model_dump_json(), px=expire_after)
-                rdb.set("track_id", str(db_track.track_guid), px=expire_after)
-                rdb.set("offset", result.track.offset or None, px=expire_after)
+                # one MULTI, so the status never shows one track's details with another's id
+                async with rdb.pipeline() as pipe:
+                    pipe.set("now_playing", result.model_dump_json(), px=expire_after)
+                    pipe.set("track_id", str(track_guid), px=expire_after)
+                    if result.track.offset:
+                        pipe.set("offset", result.track.offset, px=expire_after)
+                    else:
+                        pipe.delete("offset")
+                    pipe.set("message", result.message)
+                    pipe.set("recorded_at", result.recorded_at.isoformat())
+                    status_changed(pipe)
+                    await pipe.execute()
 
                 logger.info(
                     f"{result.track.artist_name} - {result.track.track_name}  "
@@ -264,220 +334,202 @@ def run_music_id_loop(audio_buffer: CircularBuffer, timestamp_np: np.ndarray, lo
                     else:
                         # try to fetch the next song faster for a quick update
                         duration = 0.7 * file_config.duration
-                        sleep("next_scan", max(0, remaining_seconds + 1))
+                        await scheduler.sleep(max(0, remaining_seconds + 1))
 
                 else:
                     duration = file_config.duration
-                    sleep("next_scan", back_off * file_config.duration)
+                    await scheduler.sleep(back_off * file_config.duration)
                     back_off = min(1.0, back_off + 0.25)
 
             else:
                 logger.info(result.message)
-                if rdb.get("track_id"):
+                continuity.reset()
+                if await rdb.get("track_id"):
                     back_off = 0
 
-                # If RMS is below threshold, switch to waiting mode
-                if result.rms < file_config.silence_threshold:
-                    logger.info(f"No sound detected (RMS: {result.rms}), entering waiting mode...")
+                # If RMS is below threshold or it isn't music, switch to waiting mode
+                if result.rms < exit_threshold or not is_music:
+                    logger.info(f"No music detected (RMS: {result.rms}), entering waiting mode...")
                     is_waiting = True
                     subsequent_detects = 0
                     back_off = 0
                     continue
                 
+                async with rdb.pipeline() as pipe:
+                    pipe.set("message", result.message)
+                    pipe.set("recorded_at", result.recorded_at.isoformat())
+                    status_changed(pipe)
+                    await pipe.execute()
+
                 duration = file_config.duration
-                sleep("next_scan", back_off * file_config.duration)
+                await scheduler.sleep(back_off * file_config.duration)
                 back_off = min(1.0, back_off + 0.25)
                 subsequent_detects = 0
 
-            rdb.set("message", result.message)
-            rdb.set("recorded_at", result.recorded_at.isoformat())
-
         except Exception as e:
-            rdb.delete("now_scanning")
-            logger.warning(str(e))
+            async with rdb.pipeline() as pipe:
+                pipe.delete("now_scanning")
+                status_changed(pipe)
+                await pipe.execute()
+            logger.warning(str(e) or type(e).__name__)
             # raise e
 
-            sleep("next_scan", back_off * file_config.duration)
+            await scheduler.sleep(back_off * file_config.duration)
             back_off = min(1.0, back_off + 0.25)
             duration = file_config.duration
             subsequent_detects = 0
 
 
-def run_live_stats(audio_buffer: CircularBuffer, timestamp_np: np.ndarray):
+def run_live_stats(audio_buffer: CircularBuffer, capture: CaptureSupervisor | ReplaySource, id_stream: IdStream, noise_floor: NoiseFloor):
+    stats_frames = int(env_config.live_stats_frequency * effective_sample_rate)
+
     while True:
         rdb = get_redis()
 
         try:
             time.sleep(env_config.live_stats_frequency)
 
-            with buffer_lock:
-                clip_frames = int(env_config.live_stats_frequency * effective_sample_rate)
-                audio_data = audio_buffer.read(clip_frames)
-
-            rms = float(np.sqrt(np.mean(audio_data ** 2)))
-
-            rdb.set("rms", rms, px=timedelta(seconds=env_config.live_stats_frequency + 1))
+            activity = id_stream.activity.state.model_copy(update={
+                "novelty": id_stream.changes.novelty,
+                "noise_floor": noise_floor.floor,
+                "enter_threshold": noise_floor.enter_threshold,
+                "exit_threshold": noise_floor.exit_threshold,
+            })
+            expire_after = timedelta(seconds=env_config.live_stats_frequency + 1)
+
+            with rdb.pipeline(transaction=False) as pipe:
+                pipe.set("rms", audio_buffer.rms(stats_frames), px=expire_after)
+                pipe.set("capture", capture.health().model_dump_json(), px=expire_after)
+                pipe.set("activity", activity.model_dump_json(), px=expire_after)
+                pipe.set(
+                    "plugins",
+                    json.dumps([health.model_dump(mode="json") for health in music_id.plugin_registry.health()]),
+                    px=expire_after,
+                )
+                status_changed(pipe)
+                pipe.execute()
 
         except Exception as e:
             logger.warning(str(e))
             time.sleep(env_config.live_stats_frequency)
 
 
-def run_save_music(audio_buffer: CircularBuffer, timestamp_np: np.ndarray):
-    def save_entry(entry_id: str):
-        entry = get_history_entry(entry_id)
-        if entry is None:
-            return ResponseModel(success=False, status="not_found")
-
-        logger.info(f"Saving temp {entry.track.track_name}")
-
-        if entry.started_at and entry.track.duration_seconds:
-            started_at = entry.started_at.timestamp() - file_config.temp_save_offset
-            ended_at = started_at + entry.track.duration_seconds + 2 * file_config.temp_save_offset
-        else:
-            started_at = time.time() - file_config.buffer_length_seconds
-            ended_at = time.time()
-
-        song_path = env_config.appdata_dir / "temp" / f"{entry.entry_id}.flac"
-        song_path.parent.mkdir(parents=True, exist_ok=True)
-
-        with buffer_lock:
-            last_frame_time = timestamp_np[0]
-            started_frame = clamp(
-                int((started_at - last_frame_time) * effective_sample_rate),
-                -file_config.buffer_length_seconds * effective_sample_rate,
-                -1,
+if __name__ == "__main__":
+    loop = asyncio.new_event_loop()
+    audio_buffer = None
+    if file_config.buffer_storage == "memory":
+        try:
+            audio_buffer = SharedCircularBuffer(
+                env_config.audio_buffer_name,
+                (buffer_size + buffer_guard_frames, effective_channels),
+                dtype=file_config.buffer_dtype,
+                guard_frames=buffer_guard_frames,
+                sample_rate=effective_sample_rate,
+                block_slots=buffer_block_slots,
             )
-            ended_frame = clamp(
-                int((ended_at - last_frame_time) * effective_sample_rate),
-                -file_config.buffer_length_seconds * effective_sample_rate,
-                0,
+        except SharedMemoryTooSmall as e:
+            # the disk buffer takes every captured frame, which wears out an SD card
+            shm_size_mb = 64 * (e.needed // 2 ** 26 + 2)  # rounded up to 64 MB, with room to spare
+            write_rate = effective_sample_rate * effective_channels * SAMPLE_FORMATS[file_config.buffer_dtype].bytes_per_sample
+            logger.warning(
+                f"{e} Keeping the audio buffer in {disk_buffer_path} instead, writing {write_rate // 1000} KB/s to "
+                f"disk. Start the container with --shm-size={shm_size_mb}m (shm_size: {shm_size_mb}m in "
+                f"docker-compose.yml) to keep it in memory."
             )
-            audio_data = audio_buffer.slice(started_frame, ended_frame)
-
-        sf.write(song_path, audio_data, effective_sample_rate, format="FLAC")
-
-        # metadata = FLAC(song_path)
-        # metadata["title"] = entry.track_name
-        # metadata["artist"] = entry.artist
-        # metadata["album"] = entry.album or "[Unknown Album]"
-        # metadata.save()
 
-        update_history_entries(
-            dict(entry_id=entry.entry_id),
-            saved_temp_buffer=True
+    if audio_buffer is None:
+        audio_buffer = DiskCircularBuffer(
+            disk_buffer_path,
+            (buffer_size + buffer_guard_frames, effective_channels),
+            dtype=file_config.buffer_dtype,
+            guard_frames=buffer_guard_frames,
+            sample_rate=effective_sample_rate,
+            block_slots=buffer_block_slots,
         )
 
-        return ResponseModel(success=True, message="Saved temp song", data=song_path.absolute())
-
-    rdb = get_redis()
-    ps = rdb.pubsub()
-    ps.subscribe("save")
-    for evt in ps.listen():
-        if evt["type"] != "message":
-            continue
-
-        entry_id = evt["data"]
-
-        try:
-            resp = save_entry(entry_id)
-            rdb.publish(entry_id, resp.model_dump_json())
-        except Exception as e:
-            logger.error(e)
-            rdb.publish(
-                entry_id,
-                ResponseModel(
-                    success=False,
-                    status="internal_error",
-                    message=str(e)
-                ).model_dump_json()
-            )
-
-
-def run_dump_audio(audio_buffer: CircularBuffer):
-    def dump_audio(seconds: float = None):
-        logger.info(f"Dumping audio buffer")
-
-        with buffer_lock:
-            raw = audio_buffer.read(int(seconds * effective_sample_rate if seconds else None))
-
-        raw = normalize(raw)
-        path = env_config.appdata_dir / "dump.flac"
-        sf.write(path, raw, effective_sample_rate, format="FLAC")
-        return ResponseModel(
-            success=True,
-            message="Saved audio buffer",
-            data=path.absolute(),
+    if env_config.replay_file:
+        capture = ReplaySource(
+            audio_buffer,
+            env_config.replay_file,
+            blocksize=file_config.blocksize or 1024,  # blocksize 0 lets PortAudio pick
+            speed=env_config.replay_speed,
+            loop=env_config.replay_loop,
+        )
+    else:
+        capture = CaptureSupervisor(
+            audio_buffer,
+            sample_rate=effective_sample_rate,
+            channels=effective_channels,
+            device=file_config.device,
+            blocksize=file_config.blocksize,
+            latency=file_config.latency,
+            device_offset=file_config.device_offset,
+            dtype=file_config.buffer_dtype,
         )
-
-    rdb = get_redis()
-    ps = rdb.pubsub()
-    ps.subscribe("dump")
-    for evt in ps.listen():
-        if evt["type"] != "message":
-            continue
-
-        try:
-            resp = dump_audio(float(evt["data"]) if evt["data"] else None)
-            rdb.publish("dump_response", resp.model_dump_json())
-        except Exception as e:
-            logger.error(e)
-            rdb.publish(
-                "dump_response",
-                ResponseModel(
-                    success=False,
-                    status="internal_error",
-                    message=str(e)
-                ).model_dump_json()
-            )
-
-
-if __name__ == "__main__":
-    loop = asyncio.new_event_loop()
-    audio_buffer = CircularBuffer((buffer_size, effective_channels), dtype=np.float32)
-
-    timestamp_np = np.ndarray((1,), dtype=np.float64)
-    timestamp_np[0] = 0
 
     # Start audio capture process
     capture_process = threading.Thread(
-        target=audio_capture,
-        args=(audio_buffer, timestamp_np),
+        target=capture.run,
         daemon=True
     )
     capture_process.start()
 
-    music_id_thread = threading.Thread(
-        target=run_music_id_loop,
-        args=(audio_buffer, timestamp_np, loop),
+    loop.run_until_complete(music_id.plugin_registry.sync())
+    id_stream = IdStream(
+        audio_buffer,
+        target_rate=music_id.plugin_registry.sample_rate(effective_sample_rate),
+        seconds=file_config.duration,
+    )
+    scheduler = ScanScheduler("next_scan")
+    if file_config.change_detection:
+        def on_change():
+            logger.info(f"Audio changed (novelty: {id_stream.changes.novelty:.2f}), scanning now...")
+            scheduler.wake()
+
+        id_stream.on_change = on_change
+
+    noise_floor = NoiseFloor(audio_buffer, file_config.noise_floor_seconds, minimum=file_config.silence_threshold)
+
+    id_stream_process = threading.Thread(
+        target=id_stream.run,
         daemon=True
     )
-    music_id_thread.start()
+    id_stream_process.start()
+
+    # spawning the workers takes a few seconds, which the first scan shouldn't have to wait for
+    get_process_pool(music_id.plugin_registry.config.music_id_workers)
+
+    music_id_task = loop.create_task(run_music_id_loop(audio_buffer, id_stream, noise_floor, scheduler))
 
     live_stats_process = threading.Thread(
         target=run_live_stats,
-        args=(audio_buffer, timestamp_np),
+        args=(audio_buffer, capture, id_stream, noise_floor),
         daemon=True
     )
     live_stats_process.start()
 
-    save_process = threading.Thread(
-        target=run_save_music,
-        args=(audio_buffer, timestamp_np),
-        daemon=True
-    )
-    save_process.start()
-
-    dump_process = threading.Thread(
-        target=run_dump_audio,
-        args=(audio_buffer,),
-        daemon=True
-    )
-    dump_process.start()
-
-    loop.run_forever()
-    capture_process.join()
-    music_id_thread.join()
-    live_stats_process.join()
-    save_process.join()
-    dump_process.join()
+    if file_config.history_length_seconds > 0:
+        history_process = threading.Thread(
+            target=run_audio_history,
+            args=(
+                audio_buffer,
+                AudioHistory(history_dir, file_config.history_format),
+                file_config.history_chunk_seconds,
+                file_config.history_length_seconds,
+            ),
+            daemon=True
+        )
+        history_process.start()
+
+    try:
+        loop.run_until_complete(music_id_task)
+    except KeyboardInterrupt:
+        logger.info("Stopped recording.")
+    finally:
+        music_id_task.cancel()
+        loop.run_until_complete(asyncio.gather(music_id_task, return_exceptions=True))
+        loop.run_until_complete(music_id.plugin_registry.aclose())
+        shutdown_process_pool()
+        capture.stop()
+        capture_process.join()
+        audio_buffer.close()
@@ -0,0 +1,122 @@
+"""
+Benchmarks the local library plugin's index against the size of the library, with synthetic tracks.
+
+    python -m server.benchmarks.local_library --tracks 10 100 500
+    python -m server.benchmarks.local_library --json results.json
+    python -m server.benchmarks.local_library --baseline results.json  # flags stages that got slower
+
+Each size adds to the same library, so after the first the index is refreshed incrementally. Matching is
+timed over `--repeat` clips from random tracks, with `--noise` added, and how many were found is reported.
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from server.benchmarks.report import finish, print_results
+from server.dsp import landmarks
+from server.dsp.resample import resample
+from server.music_id.library_index import LibraryIndex
+
+
+def synthetic_track(rng: np.random.Generator, seconds: float, sample_rate: int) -> np.ndarray:
+    """ Random notes with harmonics and noise bursts, so every track has its own landmarks. """
+    note_frames = int(sample_rate / 4)
+    t = np.arange(note_frames) / sample_rate
+    envelope = np.exp(-3 * t)
+
+    notes = []
+    for _ in range(int(seconds * 4)):
+        freq = 110 * 2 ** (rng.integers(0, 36) / 12)
+        note = sum(np.sin(2 * np.pi * freq * h * t) / h for h in range(1, 5)) * envelope
+        notes.append(note + 0.05 * rng.standard_normal(note_frames))
+
+    return (0.2 * np.concatenate(notes)).astype(np.float32)
+
+
+def build_library(library_dir: Path, tracks: int, seconds: float, sample_rate: int, rng: np.random.Generator):
+    for i in range(tracks):
+        path = library_dir / f"{i:05d}.flac"
+        if not path.exists():
+            sf.write(path, synthetic_track(rng, seconds, sample_rate), sample_rate, format="FLAC")
+
+
+def benchmark_case(library_dir: Path, index_dir: Path, tracks: int, args, rng: np.random.Generator) -> dict[str, dict]:
+    build_library(library_dir, tracks, args.track_seconds, args.sample_rate, rng)
+
+    index = LibraryIndex(index_dir, library_dir)
+    started_at = time.perf_counter()
+    added = index.refresh()
+    index_ms = (time.perf_counter() - started_at) * 1000
+
+    correct, match_seconds = 0, []
+    for _ in range(args.repeat):
+        track = int(rng.integers(0, tracks))
+        audio, sample_rate = sf.read(library_dir / f"{track:05d}.flac", dtype="float32")
+        start = int(rng.uniform(0, args.track_seconds - args.clip_seconds) * sample_rate)
+        clip = audio[start:start + int(args.clip_seconds * sample_rate)]
+        clip = clip + args.noise * rng.standard_normal(len(clip)).astype(np.float32)
+        clip = resample(clip, sample_rate, landmarks.SAMPLE_RATE)
+
+        started_at = time.perf_counter()
+        match = index.match(clip)
+        match_seconds.append(time.perf_counter() - started_at)
+
+        if match and match.track.path == f"{track:05d}.flac" and abs(match.offset - start / sample_rate) < 0.1:
+            correct += 1
+
+    return {
+        "index refresh": {"p50_ms": index_ms, "p95_ms": index_ms, "added": added},
+        "match": {
+            "p50_ms": float(np.median(match_seconds) * 1000),
+            "p95_ms": float(np.percentile(match_seconds, 95) * 1000),
+            "landmarks": sum(len(segment.hashes) for segment in index.segments),
+            "correct": correct,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--track-seconds", type=float, default=180)
+    parser.add_argument("--clip-seconds", type=float, default=10)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--noise", type=float, default=0.05, help="white noise added to each clip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20, help="clips to match")
+    parser.add_argument("--json", type=Path, help="save the results here")
+    parser.add_argument("--baseline", type=Path, help="results saved with --json to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown over the baseline to flag")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    results, regressions = {}, []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library_dir, index_dir = Path(tmp) / "library", Path(tmp) / "index"
+        library_dir.mkdir()
+
+        for tracks in sorted(args.tracks):
+            case = f"{tracks} tracks"
+            results[case] = benchmark_case(library_dir, index_dir, tracks, args, rng)
+            regressions += print_results(case, results[case], baseline, args.tolerance)
+
+            added, match = results[case]["index refresh"]["added"], results[case]["match"]
+            print(f"  {added} tracks added, {match['landmarks']} landmarks indexed, {match['correct']}/{args.repeat} clips found")
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    return finish(regressions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
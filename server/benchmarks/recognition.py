@@ -0,0 +1,166 @@
+"""
+Micro-benchmarks of the recognition pipeline, stage by stage, at the capture formats we see in the field.
+
+    python -m server.benchmarks.recognition
+    python -m server.benchmarks.recognition --file recording.flac --json results.json
+    python -m server.benchmarks.recognition --baseline results.json  # flags stages that got slower
+
+Each stage is timed over `--repeat` runs, then run once more under tracemalloc for its peak and retained
+memory, so the timings aren't slowed down by the tracing.
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import soundfile as sf
+
+from server import utils
+from server.circular_buffer import CircularBuffer
+from server.dsp.resample import resample
+from server.models import MusicIdResult, MusicIdTrack
+from server.music_id.base import TrackIdPlugin
+from server.benchmarks.report import finish, print_results
+
+CLIP_SECONDS = 10.5  # 0.7 of the default 15 s scan duration
+TARGET_RATE = 16000
+ENCODINGS = {
+    "vorbis": ("OGG", "VORBIS"),
+    "flac": ("FLAC", None),
+    "wav": ("WAV", "PCM_16"),
+}
+
+
+class StubPlugin(TrackIdPlugin):
+    """ Decodes the clip like a real plugin would, then answers straight away. """
+
+    is_async = False
+
+    def identify_track(self, audio: BytesIO) -> MusicIdResult:
+        sf.read(audio, dtype="float32")
+        return MusicIdResult(
+            success=True,
+            track=MusicIdTrack(offset=0, track_id="stub", track_name="Stub"),
+        )
+
+
+def synthetic_audio(seconds: float, sample_rate: int, channels: int, seed: int = 0) -> np.ndarray:
+    """ Chords with harmonics and a little noise, different in each channel. """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    audio = np.empty((len(t), channels), np.float32)
+    for channel in range(channels):
+        notes = 110 * 2 ** (rng.integers(0, 36, 3) / 12)
+        audio[:, channel] = sum(np.sin(2 * np.pi * f * t) for f in notes) / 6
+        audio[:, channel] += 0.01 * rng.standard_normal(len(t))
+
+    return audio
+
+
+def measure(stage: Callable[[], object], repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        stage()
+        timings.append(time.perf_counter() - started_at)
+
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = stage()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+
+    return {
+        "p50_ms": float(np.median(timings) * 1000),
+        "p95_ms": float(np.percentile(timings, 95) * 1000),
+        "peak_kib": (peak - before) / 1024,
+        "retained_kib": (after - before) / 1024,
+    }
+
+
+def benchmark_case(audio: np.ndarray, sample_rate: int, repeat: int) -> dict[str, dict]:
+    """ Runs every stage on `audio`, each stage on the output of the one before, like recognize_raw does. """
+    frames, channels = audio.shape
+    clip_frames = min(frames, int(CLIP_SECONDS * sample_rate))
+
+    audio_buffer = CircularBuffer((frames, channels), sample_rate=sample_rate, block_slots=frames // 1024 + 1)
+    for block in np.array_split(audio, max(1, frames // 1024)):
+        audio_buffer.write(block, timestamp=time.time())
+
+    head = audio_buffer.frames_written
+    clip = np.empty((clip_frames, channels), np.float32)
+    audio_buffer.read_into(clip, end=head)
+    mono = clip.mean(axis=1)
+    resampled = resample(mono, sample_rate, TARGET_RATE)
+    normalized = 2 * (resampled - resampled.min()) / (resampled.max() - resampled.min()) - 1
+
+    results = {
+        "ring read": measure(lambda: audio_buffer.read_into(clip, end=head), repeat),
+        "rms (block index)": measure(lambda: audio_buffer.levels(head - clip_frames, head), repeat),
+        "rms (samples)": measure(lambda: utils.rms(clip), repeat),
+        "downmix": measure(lambda: clip.mean(axis=1), repeat),
+        f"resample to {TARGET_RATE}": measure(lambda: resample(mono, sample_rate, TARGET_RATE), repeat),
+        "normalize": measure(lambda: 2 * (resampled - resampled.min()) / (resampled.max() - resampled.min()) - 1, repeat),
+    }
+
+    def encode(audio_format: str, subtype: str | None) -> BytesIO:
+        buffer = BytesIO()
+        sf.write(buffer, normalized, TARGET_RATE, format=audio_format, subtype=subtype)
+        buffer.seek(0)
+        return buffer
+
+    plugin = StubPlugin()
+    for name, (audio_format, subtype) in ENCODINGS.items():
+        results[f"encode {name}"] = measure(lambda: encode(audio_format, subtype), repeat)
+
+        encoded = encode(audio_format, subtype).getvalue()
+        results[f"stub plugin ({name})"] = measure(lambda: plugin.identify_track(BytesIO(encoded)), repeat)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", type=int, nargs="*", default=[44100, 48000, 96000])
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--file", type=Path, action="append", default=[], help="recorded audio to benchmark too")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", type=Path, help="save the results here")
+    parser.add_argument("--baseline", type=Path, help="results saved with --json to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown over the baseline to flag")
+    args = parser.parse_args()
+
+    cases = {}
+    for sample_rate in args.rates:
+        for channels in args.channels:
+            audio = synthetic_audio(CLIP_SECONDS, sample_rate, channels)
+            cases[f"synthetic {sample_rate} Hz {channels}ch"] = (audio, sample_rate)
+
+    for path in args.file:
+        audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        cases[f"{path.name} {sample_rate} Hz {audio.shape[1]}ch"] = (audio, sample_rate)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else {}
+    results, regressions = {}, []
+
+    for case, (audio, sample_rate) in cases.items():
+        results[case] = benchmark_case(audio, sample_rate, args.repeat)
+        regressions += print_results(case, results[case], baseline, args.tolerance)
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+    return finish(regressions)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
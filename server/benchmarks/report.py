@@ -0,0 +1,33 @@
+import sys
+
+
+def print_results(case: str, results: dict[str, dict], baseline: dict, tolerance: float) -> list[str]:
+    """
+    Prints each stage's results for `case`, flagging those whose p50 is more than `tolerance` slower than in
+    `baseline` (results saved with --json). Returns the flagged stages.
+    """
+    print(f"\n{case}")
+    print(f"  {'stage':<24} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>10} {'kept KiB':>10}")
+
+    regressions = []
+    for stage, stats in results.items():
+        flag = ""
+        if (previous := baseline.get(case, {}).get(stage)) and stats["p50_ms"] > previous["p50_ms"] * (1 + tolerance):
+            flag = f"  slower than baseline ({previous['p50_ms']:.2f} ms)"
+            regressions.append(f"{case}: {stage}")
+
+        memory = "".join(
+            f" {stats[key]:>10.0f}" if stats.get(key) is not None else f" {'-':>10}"
+            for key in ("peak_kib", "retained_kib")
+        )
+        print(f"  {stage:<24} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f}{memory}{flag}")
+
+    return regressions
+
+
+def finish(regressions: list[str]) -> int:
+    if regressions:
+        print(f"\n{len(regressions)} stage(s) slower than the baseline", file=sys.stderr)
+        return 1
+
+    return 0
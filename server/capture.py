@@ -0,0 +1,158 @@
+import threading
+import time
+
+import sounddevice as sd
+
+from server.circular_buffer import CircularBuffer
+from server.logger import logger
+from server.models import CaptureHealth
+
+
+class CaptureSupervisor:
+    """
+    Keeps an `sd.InputStream` feeding a CircularBuffer, capturing in the buffer's storage format.
+
+    The stream is reopened, with exponential back-off, whenever it finishes on its own (e.g. the device was
+    unplugged) or stops delivering blocks. Overflows, underflows and callback jitter are counted for
+    `health()`.
+    """
+
+    max_backoff_seconds = 30
+
+    def __init__(
+            self,
+            audio_buffer: CircularBuffer,
+            sample_rate: int,
+            channels: int,
+            device: str | None,
+            blocksize: int,
+            latency: float,
+            device_offset: float = 0,
+            dtype: str = "float32",
+    ):
+        self.audio_buffer = audio_buffer
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.device = device
+        self.blocksize = blocksize
+        self.latency = latency
+        self.device_offset = device_offset
+        self.dtype = dtype
+
+        # no callback within this long means the stream has stalled
+        self.watchdog_seconds = max(2.0, 4 * blocksize / sample_rate + latency)
+
+        self.stream_finished = threading.Event()
+        self.stop_event = threading.Event()
+
+        self.running = False
+        self.restarts = 0
+        self.callbacks = 0
+        self.input_overflows = 0
+        self.input_underflows = 0
+        self.jitter_ms = 0.0  # moving average of how late/early blocks arrive compared to the sample clock
+        self.max_jitter_ms = 0.0
+        self.last_error: str | None = None
+
+        self._last_callback_at: float | None = None
+
+    def callback(self, in_data, n_frames, time_, status: sd.CallbackFlags):
+        now = time.monotonic()
+
+        adc_time = time_.inputBufferAdcTime + (n_frames / self.sample_rate)
+        last_frame_time = adc_time + (time.time() - time_.currentTime)
+        self.audio_buffer.write(in_data, timestamp=last_frame_time + self.device_offset, adc_time=adc_time)
+
+        self.callbacks += 1
+        if status.input_overflow:
+            self.input_overflows += 1
+        if status.input_underflow:
+            self.input_underflows += 1
+
+        if self._last_callback_at is not None:
+            jitter_ms = abs((now - self._last_callback_at) - n_frames / self.sample_rate) * 1000
+            self.jitter_ms += 0.05 * (jitter_ms - self.jitter_ms)
+            self.max_jitter_ms = max(self.max_jitter_ms, jitter_ms)
+
+        self._last_callback_at = now
+
+    def run(self):
+        backoff = 1
+
+        while not self.stop_event.is_set():
+            callbacks = self.callbacks
+            try:
+                self._run_stream()
+            except (sd.PortAudioError, ValueError) as e:  # ValueError: device not found
+                self.last_error = str(e)
+                logger.warning(f"Audio stream error: {e}")
+            except Exception as e:
+                # anything else would end the thread, and with it recording, until the recorder restarts
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.exception(f"Unexpected audio stream error: {e}")
+
+            self.running = False
+            self._last_callback_at = None
+            if self.stop_event.is_set():
+                break
+            elif self.callbacks > callbacks:
+                backoff = 1  # the stream was working, so this is a fresh failure
+
+            self.restarts += 1
+            logger.warning(f"Audio stream stopped, reopening in {backoff}s...")
+            self.stop_event.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff_seconds)
+
+            # PortAudio only enumerates devices when it initializes, so a replugged device needs a reinit
+            try:
+                sd._terminate()  # noqa
+                sd._initialize()  # noqa
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.warning(f"Failed to reinitialize PortAudio: {e}")
+
+    def _run_stream(self):
+        self.stream_finished.clear()
+
+        # numpy has no int24, so packed 24-bit samples can only be captured as raw bytes
+        stream_cls = sd.RawInputStream if self.dtype == "int24" else sd.InputStream
+
+        with stream_cls(
+            samplerate=self.sample_rate,
+            blocksize=self.blocksize,
+            channels=self.channels,
+            device=self.device or None,
+            dtype=self.dtype,
+            latency=self.latency,
+            callback=self.callback,
+            finished_callback=self.stream_finished.set,
+        ):
+            logger.info("Recording...")
+            self.running = True
+
+            while not self.stop_event.is_set():
+                callbacks = self.callbacks
+                if self.stream_finished.wait(self.watchdog_seconds):
+                    if not self.stop_event.is_set():
+                        logger.warning("Audio stream finished unexpectedly")
+                    return
+                elif self.callbacks == callbacks:
+                    logger.warning(f"No audio received for {self.watchdog_seconds}s")
+                    return
+
+    def stop(self):
+        self.stop_event.set()
+        self.stream_finished.set()
+
+    def health(self) -> CaptureHealth:
+        return CaptureHealth(
+            running=self.running,
+            restarts=self.restarts,
+            callbacks=self.callbacks,
+            input_overflows=self.input_overflows,
+            input_underflows=self.input_underflows,
+            jitter_ms=self.jitter_ms,
+            max_jitter_ms=self.max_jitter_ms,
+            clock_drift_ppm=self.audio_buffer.clock_drift_ppm(),
+            last_error=self.last_error,
+        )
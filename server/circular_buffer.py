@@ -1,48 +1,642 @@
+import mmap
+import os
+import shutil
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
 import numpy as np
 
+from server.config import env_config
+from server.logger import logger
+from server.utils import clamp
+
+
+HEADER_DTYPE = np.dtype([
+    ("claimed", np.int64),
+    ("frames_written", np.int64),
+    ("timestamp", np.float64),
+    ("length", np.int64),
+    ("guard_frames", np.int64),
+    ("channels", np.int64),
+    ("sample_rate", np.int64),
+    ("dtype", "S16"),
+    ("block_slots", np.int64),
+    ("blocks_claimed", np.int64),
+    ("blocks_written", np.int64),
+])
+HEADER_SIZE = 128  # header is padded so the samples that follow stay aligned
+
+# summary of every written block, kept in a ring next to the samples
+BLOCK_DTYPE = np.dtype([
+    ("end_frame", np.int64),
+    ("frames", np.int64),
+    ("sum_squares", np.float64),
+    ("peak", np.float64),
+    ("adc_time", np.float64),  # stream clock time of the block's last frame, nan if unknown
+    ("wall_time", np.float64),  # unix time of the block's last frame
+])
+CLOCK_FIT_BLOCKS = 64  # blocks around a timestamp used to fit the sample clock against the wall clock
+
+
+class SampleFormat:
+    """ How samples are captured and stored in the ring. Readers always get float32 back. """
+
+    def __init__(self, name: str, storage_dtype, bytes_per_sample: int, scale: float):
+        self.name = name  # also the sounddevice dtype to capture in
+        self.storage_dtype = np.dtype(storage_dtype)
+        self.bytes_per_sample = bytes_per_sample
+        self.scale = np.float32(scale)  # multiplier from stored integer to float
+
+    def storage_shape(self, frames: int, channels: int) -> tuple:
+        return frames, channels * self.bytes_per_sample // self.storage_dtype.itemsize
+
+    def decode(self, src: np.ndarray, out: np.ndarray):
+        if self.storage_dtype == np.float32:
+            out[:] = src
+        elif self.bytes_per_sample == 3:
+            # place each 3-byte little-endian sample in the top of an int32, which also sign-extends it
+            for i in range(0, len(src), 65536):
+                chunk = src[i:i + 65536]
+                padded = np.zeros((len(chunk), chunk.shape[1] // 3, 4), np.uint8)
+                padded[:, :, 1:] = chunk.reshape(len(chunk), -1, 3)
+                np.multiply(padded.view(np.int32)[:, :, 0], self.scale, out=out[i:i + 65536])
+        else:
+            np.multiply(src, self.scale, out=out)
+
+
+SAMPLE_FORMATS = {
+    "float32": SampleFormat("float32", np.float32, 4, 1.0),
+    "int16": SampleFormat("int16", np.int16, 2, 2.0 ** -15),
+    "int24": SampleFormat("int24", np.uint8, 3, 2.0 ** -31),  # packed, 3 bytes per sample
+}
+
+
+class BufferOverrun(Exception):
+    """ The writer overwrote frames a reader was asking for. """
+
+
+class SharedMemoryTooSmall(RuntimeError):
+    """ /dev/shm has no room for the buffer, e.g. in a container with Docker's default 64 MB. """
+
+    def __init__(self, message: str, needed: int):
+        super().__init__(message)
+        self.needed = needed  # bytes
+
 
 class CircularBuffer:
-    def __init__(self, shape: tuple, dtype):
-        self.array = np.zeros(shape, dtype)
-        self.pos = 0
-        self.length = shape[0]
-        self.shape = shape
+    """
+    Single-writer, multi-reader ring buffer.
+
+    The writer never waits on readers. Before touching the ring it publishes how far it is about to
+    write (`claimed`), and only after the data is in place does it advance `frames_written`. Readers copy
+    without locking and then check `claimed` to find out whether the writer lapped the frames they copied,
+    retrying if it did (seqlock style).
+
+    `guard_frames` of the ring are kept out of reach of readers, so that a long copy of the oldest audio
+    (e.g. ripping the whole buffer) does not race the writer.
+
+    Samples are stored in `dtype` (one of SAMPLE_FORMATS), which can be more compact than float32, and
+    are converted to float32 as they are read.
+
+    Every write also appends the block's sum of squares, peak and timestamps to a ring of `block_slots` block
+    summaries, so levels over any range can be computed from the summaries instead of the samples, and
+    timestamps can be mapped to frames without assuming the sample clock is exact.
+
+    The header (write position, timestamp, format), block summaries and samples live in one block of memory,
+    which can be passed in as `buffer` to place the ring in shared memory.
+    """
+
+    def __init__(
+            self,
+            shape: tuple,
+            dtype="float32",
+            guard_frames: int = 0,
+            sample_rate: int = 0,
+            block_slots: int = None,
+            buffer=None,
+    ):
+        block_slots = block_slots or self.default_block_slots(shape)
+        if buffer is None:
+            buffer = bytearray(self.nbytes(shape, dtype, block_slots))
+
+        self.header = np.ndarray((), HEADER_DTYPE, buffer)
+        self.header["length"] = shape[0]
+        self.header["guard_frames"] = guard_frames
+        self.header["channels"] = shape[1] if len(shape) > 1 else 1
+        self.header["sample_rate"] = sample_rate
+        self.header["dtype"] = SAMPLE_FORMATS[dtype].name.encode()
+        self.header["block_slots"] = block_slots
+
+        self._init_views(buffer)
+
+    def _init_views(self, buffer):
+        self.header = np.ndarray((), HEADER_DTYPE, buffer)
+        self.length = int(self.header["length"])
+        self.channels = int(self.header["channels"])
+        self.sample_rate = int(self.header["sample_rate"])
+        self.shape = (self.length, self.channels)
+        self.capacity = self.length - int(self.header["guard_frames"])  # max frames a reader can ask for
+        self.format = SAMPLE_FORMATS[self.header["dtype"].item().decode()]
+        self.block_slots = int(self.header["block_slots"])
+        self.blocks = np.ndarray((self.block_slots,), BLOCK_DTYPE, buffer, HEADER_SIZE)
+        self.array = np.ndarray(
+            self.format.storage_shape(self.length, self.channels),
+            self.format.storage_dtype,
+            buffer,
+            HEADER_SIZE + self.blocks.nbytes,
+        )
+        self._scratch = None
+
+    @staticmethod
+    def default_block_slots(shape: tuple, min_block_frames: int = 256) -> int:
+        """ Enough block summaries to cover the whole ring with blocks of at least `min_block_frames`. """
+        return shape[0] // min_block_frames + 1
+
+    @staticmethod
+    def nbytes(shape: tuple, dtype="float32", block_slots: int = None) -> int:
+        block_slots = block_slots or CircularBuffer.default_block_slots(shape)
+        return (
+            HEADER_SIZE
+            + block_slots * BLOCK_DTYPE.itemsize
+            + int(np.prod(shape)) * SAMPLE_FORMATS[dtype].bytes_per_sample
+        )
+
+    @property
+    def claimed(self) -> int:
+        """ Frames written, including a write that is still in progress. """
+        return int(self.header["claimed"])
+
+    @property
+    def frames_written(self) -> int:
+        """ Frames written and safe to read. """
+        return int(self.header["frames_written"])
 
-    def write(self, data):
+    @property
+    def timestamp(self) -> float:
+        """ Time of the last written frame. """
+        return float(self.header["timestamp"])
+
+    @property
+    def blocks_written(self) -> int:
+        return int(self.header["blocks_written"])
+
+    @property
+    def pos(self):
+        return self.frames_written % self.length
+
+    def _to_storage(self, data) -> np.ndarray:
+        if not isinstance(data, np.ndarray):
+            # raw buffer from an sd.RawInputStream
+            data = np.frombuffer(data, self.array.dtype).reshape(-1, self.array.shape[1])
+
+        return data
+
+    def write(self, data, timestamp: float = None, adc_time: float = None):
+        data = self._to_storage(data)
         size = len(data)
-        end = self.pos + size
+        frames_written = self.frames_written
+        pos = frames_written % self.length
+        end = pos + size
+
+        blocks_written = self.blocks_written
+
+        self.header["claimed"] = frames_written + size
+        self.header["blocks_claimed"] = blocks_written + 1
 
         if end <= self.length:
-            self.array[self.pos:self.pos + size] = data
+            self.array[pos:end] = data
         else:
-            split = self.length - self.pos
-            self.array[self.pos:] = data[:split]
+            split = self.length - pos
+            self.array[pos:] = data[:split]
             self.array[:size - split] = data[split:]
 
-        self.pos = (self.pos + size) % self.length
+        samples = self._as_float(data).reshape(-1)
+        self.blocks[blocks_written % self.block_slots] = (
+            frames_written + size,
+            size,
+            np.dot(samples, samples),
+            max(samples.max(), -samples.min()) if samples.size else 0,
+            np.nan if adc_time is None else adc_time,
+            self.timestamp if timestamp is None else timestamp,
+        )
+
+        if timestamp is not None:
+            self.header["timestamp"] = timestamp
+
+        self.header["frames_written"] = frames_written + size
+        self.header["blocks_written"] = blocks_written + 1
+
+    def _as_float(self, data: np.ndarray) -> np.ndarray:
+        if self.format.storage_dtype == np.float32:
+            return data
+
+        if self._scratch is None or len(self._scratch) != len(data):
+            self._scratch = np.empty((len(data), self.channels), np.float32)
+
+        self.format.decode(data, self._scratch)
+        return self._scratch
+
+    def position(self) -> tuple[int, float]:
+        """ Returns a consistent (frames_written, timestamp) snapshot of the write head. """
+        while True:
+            frames_written = self.frames_written
+            timestamp = self.timestamp
+            if self.claimed == frames_written:
+                return frames_written, timestamp
+
+            time.sleep(0)  # writer is mid-block, let it finish
+
+    def frame_at(self, timestamp: float) -> int:
+        """
+        Absolute frame recorded at a unix timestamp.
+
+        Finds the blocks recorded around `timestamp` and fits a line through their (end frame, wall time),
+        which corrects for the sample clock drifting from the wall clock and smooths out callback jitter.
+        """
+        blocks_written = self.blocks_written
+        oldest = max(0, blocks_written - self.block_slots + 1)
+        if blocks_written - oldest < 2:
+            head, last_frame_time = self.position()
+            return head + int((timestamp - last_frame_time) * self.sample_rate)
+
+        i = self._find_block(timestamp, oldest, blocks_written, "wall_time")
+        first = max(oldest, min(i - CLOCK_FIT_BLOCKS // 2, blocks_written - CLOCK_FIT_BLOCKS))
+        stats = self._copy_blocks(first, min(blocks_written, first + CLOCK_FIT_BLOCKS))
+        if stats is None:
+            return self.frame_at(timestamp)  # lapped while copying
+
+        seconds_per_frame, intercept = self._fit_clock(stats)
+        return int(round((timestamp - intercept) / seconds_per_frame))
+
+    @staticmethod
+    def _fit_clock(stats: np.ndarray) -> tuple[float, float]:
+        """ Least squares fit of wall_time = intercept + seconds_per_frame * end_frame. """
+        frames = stats["end_frame"] - stats["end_frame"][0]  # keeps the fit well conditioned
+        seconds_per_frame, intercept = np.polyfit(frames, stats["wall_time"], 1)
+        return seconds_per_frame, intercept - seconds_per_frame * stats["end_frame"][0]
+
+    def clock_drift_ppm(self) -> float | None:
+        """ How much faster (+) or slower (-) the sample clock runs than the wall clock, across the buffer. """
+        blocks_written = self.blocks_written
+        stats = self._copy_blocks(max(0, blocks_written - self.block_slots + 1), blocks_written)
+        if stats is None or len(stats) < CLOCK_FIT_BLOCKS:
+            return None
+
+        seconds_per_frame, _ = self._fit_clock(stats)
+        return (1 / (seconds_per_frame * self.sample_rate) - 1) * 1e6
+
+    def slice_by_time(self, started_at: float, ended_at: float) -> np.ndarray:
+        """
+        Copies the audio recorded between two unix timestamps. Parts of the window that are no longer (or
+        not yet) in the buffer are cut off.
+        """
+        while True:
+            head = self.frames_written
+            start = clamp(self.frame_at(started_at), head - self.capacity, head)
+            end = clamp(self.frame_at(ended_at), start, head)
+
+            out = np.empty((end - start, self.channels), np.float32)
+            try:
+                self.read_into(out, end=end)
+                return out
+            except BufferOverrun:
+                continue
+
+    def read_into(self, out: np.ndarray, end: int = None) -> int:
+        """
+        Fills float32 `out` with the `len(out)` frames before absolute frame `end` (defaults to the write head)
+        and returns `end`. Raises `BufferOverrun` if an explicit `end` is too old to be read intact.
+        """
+        frames = len(out)
+        if frames > self.capacity:
+            raise ValueError(f"Cannot read {frames} frames from a buffer of capacity {self.capacity}")
+
+        while True:
+            stop = self.frames_written if end is None else end
+            start = stop - frames
+
+            if end is not None:
+                if stop > self.frames_written:
+                    raise ValueError(f"Frame {stop} has not been written yet")
+                if start < self.frames_written - self.capacity:
+                    raise BufferOverrun(f"Frame {start} is no longer in the buffer")
+
+            self._copy(start, out)
+
+            if self.claimed - self.length <= start:
+                return stop
+            elif end is not None:
+                raise BufferOverrun(f"Frame {start} was overwritten while reading")
 
     def read(self, frames: int = None):
         if frames is None:
-            frames = self.length - 1
-
-        start = (self.pos - frames) % self.length
+            frames = self.capacity
 
-        if start <= self.pos:
-            return self.array[start:self.pos]
-        else:
-            return np.concatenate([
-                self.array[start:],
-                self.array[:self.pos]
-            ])
+        out = np.empty((frames, self.channels), np.float32)
+        self.read_into(out)
+        return out
 
     def slice(self, start: int = 0, end: int = 0, step=None):
-        start = (self.pos + start) % self.length
-        end = (self.pos + end) % self.length
+        """ Copies frames `start` to `end`, both relative to (and at most) the write head. """
+        out = np.empty((end - start, self.channels), np.float32)
+        while True:
+            try:
+                self.read_into(out, self.frames_written + end)
+                return out[::step]
+            except BufferOverrun:
+                continue
 
-        if start <= end:
-            return self.array[start:end:step]
+    def block_stats(self, start: int, end: int) -> np.ndarray:
+        """
+        Returns a copy of the summaries of the blocks overlapping absolute frames `start` to `end`, oldest
+        first. Blocks that have already been dropped from the summary ring are left out.
+        """
+        while True:
+            blocks_written = self.blocks_written
+            oldest = max(0, blocks_written - self.block_slots + 1)  # one slot may be mid-write
+
+            first = self._find_block(start, oldest, blocks_written)
+            last = min(self._find_block(end - 1, first, blocks_written) + 1, blocks_written)
+            stats = self._copy_blocks(first, last)
+            if stats is not None:
+                return stats
+
+    def _copy_blocks(self, first: int, last: int) -> np.ndarray | None:
+        """ Copies blocks `first` to `last` (absolute indices), or returns None if the writer lapped them. """
+        stats = self.blocks[np.arange(first, last) % self.block_slots]
+        if self.header["blocks_claimed"] - self.block_slots <= first:
+            return stats
+
+    def _find_block(self, value, lo: int, hi: int, field: str = "end_frame") -> int:
+        """ Binary search for the first block (by absolute index) whose `field` is after `value`. """
+        column = self.blocks[field]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if column[mid % self.block_slots] > value:
+                hi = mid
+            else:
+                lo = mid + 1
+
+        return lo
+
+    def levels(self, start: int, end: int) -> tuple[float, float]:
+        """ Returns the (rms, peak) of absolute frames `start` to `end`, to the nearest block. """
+        stats = self.block_stats(start, end)
+        if not len(stats):
+            return 0.0, 0.0
+
+        samples = stats["frames"].sum() * self.channels
+        return float(np.sqrt(stats["sum_squares"].sum() / samples)), float(stats["peak"].max())
+
+    def rms(self, frames: int) -> float:
+        """ RMS of the last `frames` frames, to the nearest block. """
+        head = self.frames_written
+        return self.levels(head - frames, head)[0]
+
+    def level_chart(self, start: int, end: int, parts: int) -> list[float]:
+        """ RMS of absolute frames `start` to `end`, split into `parts`. """
+        stats = self.block_stats(start, end)
+        if not len(stats):
+            return [0.0] * parts
+        elif len(stats) < parts:
+            # fewer blocks than parts, so repeat blocks instead of leaving parts empty
+            stats = stats[np.linspace(0, len(stats) - 1, parts).round().astype(int)]
+
+        return [
+            float(np.sqrt(chunk["sum_squares"].sum() / (chunk["frames"].sum() * self.channels)))
+            for chunk in np.array_split(stats, parts)
+        ]
+
+    def _copy(self, start: int, out: np.ndarray):
+        frames = len(out)
+        pos = start % self.length
+        end = pos + frames
+
+        if end <= self.length:
+            self.format.decode(self.array[pos:end], out)
         else:
-            return np.concatenate([
-                self.array[start::step],
-                self.array[:end:step]
-            ])
+            split = self.length - pos
+            self.format.decode(self.array[pos:], out[:split])
+            self.format.decode(self.array[:frames - split], out[split:])
+
+
+class SharedCircularBuffer(CircularBuffer):
+    """ A CircularBuffer in a named shared memory segment, owned (and written) by the recorder. """
+
+    def __init__(
+            self,
+            name: str,
+            shape: tuple,
+            dtype,
+            guard_frames: int = 0,
+            sample_rate: int = 0,
+            block_slots: int = None,
+    ):
+        size = self.nbytes(shape, dtype, block_slots)
+
+        try:
+            # a previous recorder that didn't shut down cleanly leaves its segment behind
+            stale = SharedMemory(name)
+            stale.close()
+            stale.unlink()
+        except FileNotFoundError:
+            pass
+
+        # shm pages are only allocated when touched, so an undersized /dev/shm would otherwise
+        # show up later as a SIGBUS in the capture callback
+        shm_dir = Path("/dev/shm")
+        if shm_dir.is_dir() and (free := shutil.disk_usage(shm_dir).free) < size:
+            raise SharedMemoryTooSmall(
+                f"Audio buffer needs {size // 2 ** 20} MB of shared memory but /dev/shm only has "
+                f"{free // 2 ** 20} MB free. Run the container with a larger --shm-size or lower "
+                f"buffer_length_seconds.",
+                size,
+            )
+
+        self.shm = SharedMemory(name, create=True, size=size)
+        super().__init__(shape, dtype, guard_frames, sample_rate, block_slots, buffer=self.shm.buf)
+
+    def close(self):
+        del self.header, self.blocks, self.array  # views must be released before the segment can be closed
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedCircularBufferClient(CircularBuffer):
+    """
+    Read-only view of the recorder's SharedCircularBuffer, for use from other processes.
+
+    Attach for as long as it takes to read, since the recorder replaces the segment when it restarts:
+
+        with SharedCircularBufferClient(name) as audio_buffer:
+            audio = audio_buffer.read(frames)
+    """
+
+    def __init__(self, name: str):
+        self.shm = SharedMemory(name)
+        # attaching registers the segment with this process' resource tracker, which would unlink
+        # it from under the recorder when this process exits
+        resource_tracker.unregister(self.shm._name, "shared_memory")  # noqa
+
+        self._init_views(self.shm.buf)
+        self.header.flags.writeable = False
+        self.blocks.flags.writeable = False
+        self.array.flags.writeable = False
+
+    def write(self, data, timestamp: float = None, adc_time: float = None):
+        raise TypeError("SharedCircularBufferClient is read-only")
+
+    def close(self):
+        del self.header, self.blocks, self.array
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class DiskCircularBuffer(CircularBuffer):
+    """
+    A CircularBuffer memory-mapped from a file, so its length is bounded by disk instead of RAM.
+
+    If the file already holds a buffer of the same shape and format, the recorder picks up where it left
+    off, and the time it was down is filled with silence so that frames still line up with timestamps. The
+    gap is filled when the buffer is opened, before capture starts, and only the moments it takes to open
+    the stream are left for the first `write`, which runs in the capture callback.
+    """
+
+    def __init__(
+            self,
+            path: Path,
+            shape: tuple,
+            dtype,
+            guard_frames: int = 0,
+            sample_rate: int = 0,
+            block_slots: int = None,
+    ):
+        self.path = path
+        self._resuming = False
+
+        block_slots = block_slots or self.default_block_slots(shape)
+        size = self.nbytes(shape, dtype, block_slots)
+        if path.is_file() and path.stat().st_size == size:
+            self.mmap = self._map(path)
+            header = np.ndarray((), HEADER_DTYPE, self.mmap)
+            if (
+                header["length"] == shape[0]
+                and header["channels"] == shape[1]
+                and header["guard_frames"] == guard_frames
+                and header["sample_rate"] == sample_rate
+                and header["dtype"].item().decode() == dtype
+                and header["block_slots"] == block_slots
+            ):
+                self._init_views(self.mmap)
+                # a write that was in progress when the recorder died will never be committed
+                self.header["claimed"] = self.header["frames_written"]
+                self.header["blocks_claimed"] = self.header["blocks_written"]
+                self._resuming = True
+                logger.info(f"Resuming audio buffer from {path} ({self.frames_written} frames written)")
+                self._fill_gap(time.time())
+                return
+
+            del header
+            self.mmap.close()
+
+        # build the new file next to the old one, so readers that still have the old one open aren't
+        # left with a truncated mapping
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("wb") as file:
+            os.posix_fallocate(file.fileno(), 0, size)  # fail now rather than with a SIGBUS on a full disk
+        os.replace(tmp_path, path)
+
+        self.mmap = self._map(path)
+        super().__init__(shape, dtype, guard_frames, sample_rate, block_slots, buffer=self.mmap)
+
+    @staticmethod
+    def _map(path: Path) -> mmap.mmap:
+        with path.open("r+b") as file:
+            return mmap.mmap(file.fileno(), 0)
+
+    def write(self, data, timestamp: float = None, adc_time: float = None):
+        data = self._to_storage(data)
+
+        if self._resuming and timestamp is not None:
+            self._resuming = False
+            self._fill_gap(timestamp - len(data) / self.sample_rate)
+
+        super().write(data, timestamp, adc_time)
+
+    def _fill_gap(self, until: float):
+        """ Fills the time between the last write and `until` with silence. """
+        gap = round((until - self.timestamp) * self.sample_rate)
+        if gap > 0:
+            self._write_silence(min(gap, self.length), until)
+
+    def _write_silence(self, frames: int, ends_at: float):
+        silence = np.zeros((min(frames, self.sample_rate), self.array.shape[1]), self.array.dtype)
+        while frames > 0:
+            chunk = silence[:frames]
+            frames -= len(chunk)
+            super().write(chunk, ends_at - frames / self.sample_rate)
+
+    def close(self):
+        del self.header, self.blocks, self.array
+        self.mmap.flush()
+        self.mmap.close()
+
+
+class DiskCircularBufferClient(CircularBuffer):
+    """ Read-only view of the recorder's DiskCircularBuffer, for use from other processes. """
+
+    def __init__(self, path: Path):
+        with path.open("rb") as file:
+            self.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        self._init_views(self.mmap)
+
+    def write(self, data, timestamp: float = None, adc_time: float = None):
+        raise TypeError("DiskCircularBufferClient is read-only")
+
+    def close(self):
+        del self.header, self.blocks, self.array
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+disk_buffer_path = env_config.appdata_dir / "audio_buffer.bin"
+
+
+def attach_audio_buffer() -> SharedCircularBufferClient | DiskCircularBufferClient:
+    """
+    Attaches to the recorder's audio buffer from another process, in shared memory or on disk, whichever the
+    running recorder writes to. The setting may have changed since it started, and a buffer it no longer
+    uses can be left behind, so if both exist the one written last wins. Raises FileNotFoundError if the
+    recorder hasn't created either.
+    """
+    buffers = []
+    try:
+        buffers.append(SharedCircularBufferClient(env_config.audio_buffer_name))
+    except FileNotFoundError:
+        pass
+
+    if disk_buffer_path.is_file():
+        buffers.append(DiskCircularBufferClient(disk_buffer_path))
+
+    if not buffers:
+        raise FileNotFoundError(f"No audio buffer in shared memory or at {disk_buffer_path}")
+
+    latest = max(buffers, key=lambda buffer: buffer.timestamp)
+    for buffer in buffers:
+        if buffer is not latest:
+            buffer.close()
+
+    return latest
@@ -1,6 +1,7 @@
 import json
 import os
 from pathlib import Path
+from typing import Literal
 
 from pydantic import BaseModel
 import secrets
@@ -22,11 +23,17 @@ class EnvConfig(BaseModel):
     https_websocket_url: str = ""
 
     live_stats_frequency: float = 0.2
+    audio_buffer_name: str = "pidentify-audio"  # shared memory segment holding the recorder's audio buffer
 
     appdata_dir: Path = Path("/etc/pidentify/config")
     music_library_dir: Path = Path("/etc/pidentify/music")
     recorder_service_path: Path = Path("/run/service/recorder")
 
+    last_fm_url: str = "https://ws.audioscrobbler.com/2.0"
+    replay_file: Path | None = None  # record from this audio file instead of the sound card, for testing
+    replay_speed: float = 1.0
+    replay_loop: bool = True
+
 
 env_config = EnvConfig.model_validate(os.environ)
 config_fp = env_config.appdata_dir / "config.yaml"
@@ -45,13 +52,26 @@ class FileConfig(BaseModel):
     latency: float = 1
 
     duration: int = 15
-    silence_threshold: float = 0.0004
+    silence_threshold: float = 0.0004  # the minimum when adaptive_silence_threshold is on
+    adaptive_silence_threshold: bool = True  # derive the thresholds from the measured noise floor
+    noise_floor_seconds: int = 300
+    music_detection: bool = True  # only scan when the audio sounds like music, not just when it's loud enough
+    change_detection: bool = True  # scan straight away when the audio changes abruptly, e.g. the next track
+    local_confirm_seconds: int = 180  # confirm the same track locally for this long after the plugin found it
 
     buffer_length_seconds: int = 12 * 60
+    buffer_dtype: Literal["float32", "int16", "int24"] = "float32"  # int16 halves the buffer's memory
+    buffer_storage: Literal["memory", "disk"] = "memory"  # disk keeps the buffer across recorder restarts
+    history_length_seconds: int = 0  # compressed audio kept beyond the buffer, 0 to disable
+    history_chunk_seconds: int = 10
+    history_format: Literal["flac", "opus", "vorbis"] = "opus"
     temp_save_offset: int = 30
 
     last_fm_key: str = ""
     music_id_plugin: str = ""
+    music_id_plugins: list[str] = []  # in order of preference, falling back to music_id_plugin when empty
+    music_id_plugin_options: dict[str, dict] = {}  # each plugin's PluginOptions, by plugin name
+    music_id_workers: int = 0  # identify in this many worker processes instead of the recorder, 0 to disable
 
     admin_username: str = "admin"
     admin_password_hash: str | None = None
@@ -0,0 +1,117 @@
+import numpy as np
+
+from server.models import MusicActivity
+
+
+FEATURE_DTYPE = np.dtype([
+    ("rms", np.float32),
+    ("flatness", np.float32),  # 0 for a pure tone, ~0.5 for white noise
+    ("flux", np.float32),  # share of the frame's energy that is new since the previous frame
+    ("low_band", np.float32),  # share of the energy below 300 Hz
+    ("mid_band", np.float32),  # 300 Hz - 4 kHz
+    ("high_band", np.float32),  # above 4 kHz
+])
+
+
+class ActivityDetector:
+    """
+    Decides whether a mono stream sounds like music from spectral features of short frames, computed as
+    blocks arrive and kept for the last `window_seconds`.
+
+    Music is tonal (low spectral flatness), keeps changing (spectral flux, unlike hum from an air conditioner
+    or fridge) and has few quiet frames (unlike speech, which pauses between syllables and words). The
+    decision has hysteresis so it doesn't flicker around the threshold.
+    """
+
+    enter_score = 0.5
+    exit_score = 0.3
+
+    def __init__(self, sample_rate: int, window_seconds: float = 3.0):
+        self.sample_rate = sample_rate
+        self.frame_size = 1 << int(np.ceil(np.log2(0.064 * sample_rate)))  # ~64 ms
+        self.hop = self.frame_size // 2
+
+        self.window = np.hanning(self.frame_size).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_size, 1 / sample_rate)
+        self.bins = freqs >= 50  # leave out DC and rumble
+        self.low = freqs[self.bins] < 300
+        self.high = freqs[self.bins] >= 4000
+
+        self.features = np.zeros(max(1, int(window_seconds * sample_rate / self.hop)), FEATURE_DTYPE)
+        self.frames = 0
+
+        self.pending = np.zeros(0, np.float32)
+        self.last_power: np.ndarray | None = None
+
+        self.is_music = False
+        self.state = MusicActivity(is_music=False)
+
+    def process(self, block: np.ndarray) -> MusicActivity:
+        self.pending = np.concatenate([self.pending, block.reshape(-1)])
+        count = (len(self.pending) - self.frame_size) // self.hop + 1
+        if count <= 0:
+            return self.state
+
+        frames = np.lib.stride_tricks.sliding_window_view(self.pending, self.frame_size)[::self.hop][:count]
+        self._add_features(self._frame_features(frames))
+        self.pending = self.pending[count * self.hop:]
+
+        self.state = self._decide()
+        return self.state
+
+    def _frame_features(self, frames: np.ndarray) -> np.ndarray:
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1))[:, self.bins] ** 2 + 1e-12
+
+        previous = np.vstack([
+            power[:1] if self.last_power is None else self.last_power[None],
+            power[:-1],
+        ])
+        self.last_power = power[-1]
+
+        total = power.sum(axis=1)
+        low, high = power[:, self.low].sum(axis=1), power[:, self.high].sum(axis=1)
+
+        features = np.empty(len(frames), FEATURE_DTYPE)
+        features["rms"] = np.sqrt(np.einsum("ij,ij->i", frames, frames) / self.frame_size)
+        features["flatness"] = np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+        features["flux"] = np.maximum(power - previous, 0).sum(axis=1) / total
+        features["low_band"] = low / total
+        features["high_band"] = high / total
+        features["mid_band"] = 1 - features["low_band"] - features["high_band"]
+        return features
+
+    def _add_features(self, features: np.ndarray):
+        size = len(self.features)
+        features = features[-size:]
+        positions = (self.frames + np.arange(len(features))) % size
+        self.features[positions] = features
+        self.frames += len(features)
+
+    def _decide(self) -> MusicActivity:
+        features = self.features[:min(self.frames, len(self.features))]
+        rms = features["rms"]
+
+        flatness = float(np.median(features["flatness"]))
+        flux = float(features["flux"].mean())  # onsets are only a few frames, so not the median
+        low_band = float(features["low_band"].mean())
+        low_energy_ratio = float(np.mean(rms < 0.5 * rms.mean())) if rms.any() else 1.0
+
+        tonal = np.clip((0.45 - flatness) / 0.3, 0, 1)
+        changing = np.clip((flux - 0.02) / 0.06, 0, 1)
+        not_hum = 1 - np.clip((low_band - 0.85) / 0.15, 0, 1)
+        not_speech = 1 - np.clip((low_energy_ratio - 0.3) / 0.3, 0, 1)
+        score = float(tonal * changing * not_hum * not_speech)
+
+        self.is_music = score >= (self.exit_score if self.is_music else self.enter_score)
+
+        return MusicActivity(
+            is_music=self.is_music,
+            score=score,
+            rms=float(np.sqrt(np.mean(rms ** 2))),
+            flatness=flatness,
+            flux=flux,
+            low_band=low_band,
+            mid_band=float(features["mid_band"].mean()),
+            high_band=float(features["high_band"].mean()),
+            low_energy_ratio=low_energy_ratio,
+        )
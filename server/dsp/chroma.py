@@ -0,0 +1,40 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=8)
+def chroma_matrix(sample_rate: int, frame_size: int, min_freq: float = 110, max_freq: float = 5000) -> np.ndarray:
+    """ (bins, 12) matrix folding an rfft power spectrum into pitch classes, C first. """
+    freqs = np.fft.rfftfreq(frame_size, 1 / sample_rate)
+    matrix = np.zeros((len(freqs), 12), np.float32)
+
+    inside = (freqs >= min_freq) & (freqs <= max_freq)
+    pitch_class = np.round(12 * np.log2(freqs[inside] / 440) + 9).astype(int) % 12  # A is 9 semitones above C
+    matrix[np.flatnonzero(inside), pitch_class] = 1
+
+    matrix.flags.writeable = False
+    return matrix
+
+
+def chromagram(audio: np.ndarray, sample_rate: int, frame_size: int = 4096) -> np.ndarray:
+    """ Per-frame pitch class energies of mono `audio`, each frame scaled to unit length. """
+    audio = audio.reshape(-1)
+    if len(audio) < frame_size:
+        return np.zeros((0, 12), np.float32)
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, frame_size)[::frame_size // 2]
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame_size).astype(np.float32), axis=1)) ** 2
+    chroma = np.sqrt(power @ chroma_matrix(sample_rate, frame_size))
+    return chroma / (np.linalg.norm(chroma, axis=1, keepdims=True) + 1e-12)
+
+
+def chroma_profile(audio: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Average pitch class distribution of `audio`, which stays fairly constant through a song. It's centred
+    and scaled to unit length, so the dot product of two profiles is their correlation.
+    """
+    chroma = chromagram(audio, sample_rate)
+    profile = chroma.mean(axis=0) if len(chroma) else np.zeros(12, np.float32)
+    profile = profile - profile.mean()
+    return profile / (np.linalg.norm(profile) + 1e-12)
@@ -0,0 +1,71 @@
+import numpy as np
+
+
+SAMPLE_RATE = 8000  # fingerprints only look at the spectrum below 4 kHz
+FRAME_SIZE = 512
+HOP = 256  # 32 ms, the resolution of landmark times
+FRAME_SECONDS = HOP / SAMPLE_RATE
+
+PEAK_TIME_RADIUS = 8  # frames a peak must dominate either side of it
+PEAK_FREQ_RADIUS = 12  # bins
+PEAKS_PER_SECOND = 30
+
+FAN_OUT = 10  # later peaks each peak is paired with
+MAX_DT = 63  # frames, fits the hash's 6 bits
+MAX_DF = 96  # bins
+
+
+def _max_filter(values: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(values, pad, constant_values=-np.inf)
+    return np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1, axis=axis).max(axis=-1)
+
+
+def spectrogram_peaks(audio: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the (frame, bin) of the spectrogram's local maxima in mono `SAMPLE_RATE` audio, sorted by frame.
+    These survive noise and compression well, so they're what a fingerprint is made of.
+    """
+    audio = audio.reshape(-1)
+    if len(audio) < FRAME_SIZE:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+
+    frames = np.lib.stride_tricks.sliding_window_view(audio, FRAME_SIZE)[::HOP]
+    spectrum = np.log(np.abs(np.fft.rfft(frames * np.hanning(FRAME_SIZE), axis=1)) + 1e-6)
+    spectrum[:, :4] = -np.inf  # DC and rumble
+
+    local_max = _max_filter(_max_filter(spectrum, PEAK_TIME_RADIUS, 0), PEAK_FREQ_RADIUS, 1)
+    is_peak = (spectrum == local_max) & (spectrum > np.median(spectrum[:, 4:]) + 1)
+    times, bins = np.nonzero(is_peak)
+
+    # keep only the strongest peaks, so the density doesn't depend on how loud or busy the audio is
+    limit = max(1, int(PEAKS_PER_SECOND * len(frames) * FRAME_SECONDS))
+    if len(times) > limit:
+        strongest = np.sort(np.argpartition(spectrum[times, bins], -limit)[-limit:])
+        times, bins = times[strongest], bins[strongest]
+
+    return times, bins
+
+
+def landmark_hashes(audio: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pairs each spectrogram peak with the next few peaks after it. Returns each pair's hash of
+    (anchor bin, target bin, frames between them) and the anchor's frame.
+    """
+    times, bins = spectrogram_peaks(audio)
+    hashes, anchor_times = [], []
+
+    for k in range(1, FAN_OUT + 1):
+        dt = times[k:] - times[:-k]
+        df = bins[k:] - bins[:-k]
+        valid = (dt > 0) & (dt <= MAX_DT) & (np.abs(df) <= MAX_DF)
+
+        anchors = np.flatnonzero(valid)
+        hashes.append((bins[anchors] << 15) | (bins[anchors + k] << 6) | dt[anchors])
+        anchor_times.append(times[anchors])
+
+    return (
+        np.concatenate(hashes).astype(np.uint32),
+        np.concatenate(anchor_times).astype(np.uint32),
+    )
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+
+from server.circular_buffer import CircularBuffer
+
+
+class NoiseFloor:
+    """
+    Rolling estimate of the room's noise floor, as a low percentile of the per-block RMS in the last
+    `window_seconds` of `audio_buffer`, and the thresholds derived from it.
+
+    Sound has to reach `enter_threshold` to start scanning, and scanning carries on until it drops below
+    the lower `exit_threshold`, so a level hovering around one threshold doesn't flip between the two.
+
+    Blocks heard while music was playing are left out, so a long set can't lift the floor over the music
+    itself, and the floor rises by at most `max_rise_ratio` a minute. It can drop straight away.
+    """
+
+    enter_ratio = 4.0  # +12 dB over the floor
+    exit_ratio = 2.0  # +6 dB
+    max_rise_ratio = 2.0  # +6 dB a minute
+
+    def __init__(self, audio_buffer: CircularBuffer, window_seconds: float, minimum: float = 0.0, percentile: float = 5):
+        self.audio_buffer = audio_buffer
+        self.window_frames = int(window_seconds * audio_buffer.sample_rate)
+        self.minimum = minimum  # thresholds never go below this, e.g. for a floor of digital silence
+        self.percentile = percentile
+
+        self.floor: float | None = None
+        self.updated_at = 0.0  # monotonic time the floor was last estimated
+        self.last_head = audio_buffer.frames_written  # frames written at the last update
+        self.music_spans: list[list[int]] = []  # [start, end) frames heard while music was playing
+
+    def update(self, is_music: bool = False) -> float | None:
+        """ Re-estimates the floor, or holds it while `is_music`, noting the frames since the last update as music. """
+        head = self.audio_buffer.frames_written
+        start = head - self.window_frames
+        self.music_spans = [span for span in self.music_spans if span[1] > start]
+
+        if is_music:
+            if self.music_spans and self.music_spans[-1][1] >= self.last_head:
+                self.music_spans[-1][1] = head
+            else:
+                self.music_spans.append([self.last_head, head])
+            self.last_head = head
+            return self.floor
+        self.last_head = head
+
+        stats = self.audio_buffer.block_stats(start, head)
+        keep = stats["sum_squares"] > 0  # gaps filled with silence aren't the room
+        for span_start, span_end in self.music_spans:
+            keep &= (stats["end_frame"] <= span_start) | (stats["end_frame"] - stats["frames"] >= span_end)
+        stats = stats[keep]
+
+        if len(stats):
+            block_rms = np.sqrt(stats["sum_squares"] / (stats["frames"] * self.audio_buffer.channels))
+            floor = float(np.percentile(block_rms, self.percentile))
+
+            now = time.monotonic()
+            if self.floor:
+                floor = min(floor, self.floor * self.max_rise_ratio ** ((now - self.updated_at) / 60))
+            self.floor = floor
+            self.updated_at = now
+
+        return self.floor
+
+    @property
+    def enter_threshold(self) -> float:
+        return max(self.minimum, (self.floor or 0.0) * self.enter_ratio)
+
+    @property
+    def exit_threshold(self) -> float:
+        return max(self.minimum, (self.floor or 0.0) * self.exit_ratio)
@@ -0,0 +1,101 @@
+import numpy as np
+
+
+class ChangeDetector:
+    """
+    Spots abrupt changes in what a mono stream sounds like, e.g. a DJ moving on to the next track.
+
+    Every hop the stream is summarised as log energies in log-spaced bands, with the frame's average level
+    taken out so a change in volume alone doesn't count. Novelty compares the bands over the last
+    `recent_seconds` with the `past_seconds` before them, in units of how much the bands vary within those
+    windows, so a busy song doesn't look novel all the time. A change is reported when novelty peaks well
+    above its own recent typical value.
+    """
+
+    bands = 24
+    min_novelty = 1.0
+    mad_factor = 5.0  # how many median absolute deviations above the median a peak must be
+
+    def __init__(
+            self,
+            sample_rate: int,
+            hop_seconds: float = 0.1,
+            recent_seconds: float = 3.0,
+            past_seconds: float = 8.0,
+            refractory_seconds: float = 15.0,
+    ):
+        self.sample_rate = sample_rate
+        self.hop = int(hop_seconds * sample_rate)
+        self.frame_size = 1 << int(np.ceil(np.log2(self.hop)))
+        self.recent = int(recent_seconds / hop_seconds)
+        self.past = int(past_seconds / hop_seconds)
+        self.refractory = int(refractory_seconds / hop_seconds)
+
+        self.window = np.hanning(self.frame_size).astype(np.float32)
+        freqs = np.fft.rfftfreq(self.frame_size, 1 / sample_rate)
+        edges = np.geomspace(100, min(8000, sample_rate / 2), self.bands + 1)
+        band = np.digitize(freqs, edges) - 1
+        self.band_matrix = np.zeros((len(freqs), self.bands), np.float32)
+        inside = (band >= 0) & (band < self.bands)
+        self.band_matrix[inside, band[inside]] = 1
+
+        self.descriptors = np.zeros((self.recent + self.past, self.bands), np.float32)
+        self.novelty_history = np.zeros(int(60 / hop_seconds), np.float32)
+        self.hops = 0
+        self.last_change = -self.refractory
+        self.changes = 0  # number of changes detected so far
+
+        self.pending = np.zeros(0, np.float32)
+        self.novelty = 0.0
+        self._rising = False
+
+    def process(self, block: np.ndarray) -> bool:
+        """ Adds a block of audio and returns True if a change was detected in it. """
+        self.pending = np.concatenate([self.pending, block.reshape(-1)])
+        count = (len(self.pending) - self.frame_size) // self.hop + 1
+        if count <= 0:
+            return False
+
+        frames = np.lib.stride_tricks.sliding_window_view(self.pending, self.frame_size)[::self.hop][:count]
+        self.pending = self.pending[count * self.hop:]
+
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        descriptors = np.log10(power @ self.band_matrix + 1e-10)
+        descriptors -= descriptors.mean(axis=1, keepdims=True)
+
+        changed = False
+        for descriptor in descriptors:
+            changed |= self._add(descriptor)
+
+        return changed
+
+    def _add(self, descriptor: np.ndarray) -> bool:
+        size = len(self.descriptors)
+        self.descriptors[self.hops % size] = descriptor
+        self.hops += 1
+        if self.hops < size:
+            return False
+
+        order = np.arange(self.hops - size, self.hops) % size
+        past, recent = self.descriptors[order[:self.past]], self.descriptors[order[self.past:]]
+        spread = np.sqrt((past.var(axis=0) + recent.var(axis=0)) / 2 + 1e-3)
+        novelty = float(np.sqrt(np.mean(((recent.mean(axis=0) - past.mean(axis=0)) / spread) ** 2)))
+
+        threshold = self.min_novelty
+        history = self.novelty_history[:min(self.hops - size, len(self.novelty_history))]
+        if len(history):
+            median = np.median(history)
+            threshold = max(threshold, float(median + self.mad_factor * np.median(np.abs(history - median))))
+        self.novelty_history[(self.hops - size) % len(self.novelty_history)] = novelty
+
+        # report the change once novelty stops rising, so it's reported at the peak
+        peaked = self._rising and novelty < self.novelty
+        self._rising = novelty > threshold and novelty >= self.novelty
+        self.novelty = novelty
+
+        if peaked and self.hops - self.last_change >= self.refractory:
+            self.last_change = self.hops
+            self.changes += 1
+            return True
+
+        return False
@@ -0,0 +1,132 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def polyphase_filter(up: int, down: int) -> tuple[np.ndarray, int]:
+    """
+    Kaiser windowed sinc low-pass for resampling by `up / down`, split into its `up` phases.
+
+    Returns (phases, half_len) where `phases[p, j]` is tap `p + j * up` of the filter and `half_len` is the
+    filter's delay in upsampled frames.
+    """
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    n = np.arange(-half_len, half_len + 1)
+
+    taps = np.sinc(n / max_rate) / max_rate * np.kaiser(len(n), 5.0) * up
+    taps = np.pad(taps, (0, -len(taps) % up))
+
+    phases = np.ascontiguousarray(taps.reshape(-1, up).T, np.float32)
+    phases.flags.writeable = False  # shared by every caller through the cache
+    return phases, half_len
+
+
+def _ratio(sample_rate: int, target_rate: int) -> tuple[int, int]:
+    g = math.gcd(sample_rate, target_rate)
+    return target_rate // g, sample_rate // g
+
+
+def _filter(audio: np.ndarray, audio_start: int, up: int, down: int, first: int, frames: int) -> np.ndarray:
+    """
+    Output frames `first` to `first + frames` of resampling by `up / down`, where `audio[0]` is input frame
+    `audio_start`. `audio` must hold every input frame those outputs depend on.
+    """
+    phases, half_len = polyphase_filter(up, down)
+    taps_per_phase = phases.shape[1]
+    out = np.zeros((frames,) + audio.shape[1:], np.float32)
+
+    # windows[i] is input frames i to i + taps_per_phase, reversed so it lines up with a phase's taps
+    windows = np.lib.stride_tricks.sliding_window_view(audio, taps_per_phase, axis=0)[..., ::-1]
+
+    # output frame n is the filtered, upsampled signal at n * down + half_len, which only involves phase
+    # (n * down + half_len) % up. Every `up`th output uses the same phase and steps `down` input frames.
+    for offset in range(min(up, frames)):
+        position = (first + offset) * down + half_len
+        phase, base = position % up, position // up - audio_start
+        count = len(range(offset, frames, up))
+
+        start = base - taps_per_phase + 1
+        out[offset::up] = windows[start:start + (count - 1) * down + 1:down] @ phases[phase]
+
+    return out
+
+
+def resample(audio: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resamples `audio` (frames along the first axis) from `sample_rate` to `target_rate` with a polyphase
+    filter, so only the input frames and taps that contribute to an output frame are ever multiplied.
+    """
+    if sample_rate == target_rate:
+        return audio
+
+    up, down = _ratio(sample_rate, target_rate)
+    phases, half_len = polyphase_filter(up, down)
+    taps_per_phase = phases.shape[1]
+
+    out_frames = -(-len(audio) * up // down)
+    if out_frames == 0:
+        return np.zeros((0,) + audio.shape[1:], np.float32)
+
+    # zeros either side of the audio, for the taps that hang over its ends
+    last_base = ((out_frames - 1) * down + half_len) // up
+    padded = np.zeros((max(last_base, len(audio)) + taps_per_phase + 1,) + audio.shape[1:], np.float32)
+    padded[taps_per_phase:taps_per_phase + len(audio)] = audio
+
+    return _filter(padded, -taps_per_phase, up, down, 0, out_frames)
+
+
+class StreamResampler:
+    """
+    Resamples audio that arrives in blocks, giving the same output as `resample` on all of it at once.
+
+    Outputs lag the input by half the filter length, since each needs the input frames after it.
+    """
+
+    def __init__(self, sample_rate: int, target_rate: int, channels: tuple = ()):
+        self.sample_rate = sample_rate
+        self.target_rate = target_rate
+        self.up, self.down = _ratio(sample_rate, target_rate)
+
+        phases, self.half_len = polyphase_filter(self.up, self.down)
+        self.taps_per_phase = phases.shape[1]
+
+        # input that later outputs still depend on, starting with silence for the taps before the first frame
+        self.pending = np.zeros((self.taps_per_phase,) + channels, np.float32)
+        self.pending_start = -self.taps_per_phase
+
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if self.sample_rate == self.target_rate:
+            self.frames_in += len(block)
+            self.frames_out += len(block)
+            return block
+
+        self.pending = np.concatenate([self.pending, block])
+        self.frames_in += len(block)
+
+        # the last output whose newest input frame has arrived
+        ready = max(self.frames_out, (self.frames_in * self.up - 1 - self.half_len) // self.down + 1)
+        out = _filter(self.pending, self.pending_start, self.up, self.down, self.frames_out, ready - self.frames_out)
+        self.frames_out = ready
+
+        keep_from = (ready * self.down + self.half_len) // self.up - self.taps_per_phase + 1
+        if keep_from > self.pending_start:
+            self.pending = self.pending[keep_from - self.pending_start:]
+            self.pending_start = keep_from
+
+        return out
+
+    def flush(self) -> np.ndarray:
+        """
+        The outputs still held back after the last block, as if the input ended there like in `resample`.
+        The resampler can't take more blocks after this.
+        """
+        frames_out = self.frames_out
+        out_frames = -(-self.frames_in * self.up // self.down)
+        out = self.process(np.zeros((self.taps_per_phase,) + self.pending.shape[1:], np.float32))
+        return out[:out_frames - frames_out]
@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Callable
+
+import numpy as np
+
+from server.circular_buffer import CircularBuffer, BufferOverrun
+from server.dsp.activity import ActivityDetector
+from server.dsp.novelty import ChangeDetector
+from server.dsp.resample import StreamResampler
+from server.logger import logger
+
+
+class IdStream:
+    """
+    Mono audio at the music id plugin's sample rate, kept up to date from the capture buffer a block at a
+    time, so taking a clip for identification is only a copy out of `buffer`. Each block is also fed to
+    `activity`, which tracks whether the audio sounds like music, and `changes`, which calls `on_change`
+    when the audio changes abruptly.
+
+    `retarget` switches to another rate when the plugins change, starting the stream over.
+    """
+
+    def __init__(self, audio_buffer: CircularBuffer, target_rate: int, seconds: float, block_seconds: float = 0.1):
+        self.audio_buffer = audio_buffer
+        self.seconds = seconds
+        self.block_seconds = block_seconds
+        self.block_frames = max(1, int(block_seconds * audio_buffer.sample_rate))
+
+        self.on_change: Callable[[], None] | None = None
+        self.resampler: StreamResampler | None = None
+        self.next_frame = 0  # next frame of the capture buffer to resample
+        self.lock = threading.Lock()  # held while a block is processed, so retargeting never splits one
+
+        self._build(target_rate)
+
+    def _build(self, target_rate: int):
+        self.target_rate = target_rate
+
+        guard_frames = int(target_rate * 2)
+        self.buffer = CircularBuffer(
+            (int(self.seconds * target_rate) + guard_frames, 1),
+            guard_frames=guard_frames,
+            sample_rate=target_rate,
+            block_slots=CircularBuffer.default_block_slots(
+                (int(self.seconds * target_rate),),
+                int(self.block_seconds * target_rate),
+            ),
+        )
+
+        self.activity = ActivityDetector(target_rate)
+        self.changes = ChangeDetector(target_rate)
+
+    def retarget(self, target_rate: int):
+        """ Starts the stream over at `target_rate`, from the latest audio in the capture buffer. """
+        with self.lock:
+            logger.info(f"Music id stream switching from {self.target_rate} Hz to {target_rate} Hz")
+            self._build(target_rate)
+            if self.resampler is not None:
+                self._restart(self.audio_buffer.frames_written)
+
+    def clip(self, out: np.ndarray) -> float:
+        """ Fills `out` with the latest `len(out)` frames and returns the time of the last one. """
+        head, last_frame_time = self.buffer.position()
+        self.buffer.read_into(out, end=head)
+        return last_frame_time
+
+    def _restart(self, frame: int):
+        self.resampler = StreamResampler(self.audio_buffer.sample_rate, self.target_rate)
+        self.started_frame = self.next_frame = frame
+
+    def run(self):
+        sample_rate = self.audio_buffer.sample_rate
+        block = np.empty((4 * self.block_frames, self.audio_buffer.channels), np.float32)
+        self._restart(self.audio_buffer.frames_written)
+
+        while True:
+            head, last_frame_time = self.audio_buffer.position()
+            if head - self.next_frame < self.block_frames:
+                time.sleep((self.block_frames - (head - self.next_frame)) / sample_rate)
+                continue
+
+            with self.lock:
+                if self.next_frame < head - self.audio_buffer.capacity:
+                    logger.warning("Music id stream fell behind the capture buffer, skipping ahead")
+                    self._restart(head - self.block_frames)
+
+                changed = self._process(block, head, last_frame_time)
+
+            if changed and self.on_change:
+                self.on_change()
+
+    def _process(self, block: np.ndarray, head: int, last_frame_time: float) -> bool:
+        """ Resamples the next block, returning whether the audio changed abruptly. """
+        sample_rate = self.audio_buffer.sample_rate
+        if self.next_frame >= head:
+            return False  # retargeted since the head was read
+
+        end = min(head, self.next_frame + len(block))
+        data = block[:end - self.next_frame]
+        try:
+            self.audio_buffer.read_into(data, end=end)
+        except BufferOverrun:
+            self._restart(self.audio_buffer.frames_written)
+            return False
+
+        self.next_frame = end
+        mono = self.resampler.process(data.mean(axis=1))
+        if not len(mono):
+            return False
+
+        # the resampler is centred, so output frame n lines up with input frame n * sample_rate / target_rate
+        end_frame = self.started_frame + self.resampler.frames_out * sample_rate / self.target_rate
+        timestamp = last_frame_time - (head - end_frame) / sample_rate
+        self.buffer.write(mono[:, None], timestamp=timestamp)
+        self.activity.process(mono)
+        return self.changes.process(mono)
@@ -16,7 +16,7 @@ duration_re = re.compile(r"((\d{1,2}:)+\d\d)")
 async def get_last_fm_track(title, artist) -> LastFMTrack | None:
     async with httpx.AsyncClient() as client:
         try:
-            resp = (await client.post("https://ws.audioscrobbler.com/2.0", params={
+            resp = (await client.post(env_config.last_fm_url, params={
                 "method": "track.getInfo",
                 "api_key": file_config.last_fm_key,
                 "artist": artist,
@@ -50,7 +50,7 @@ async def get_last_fm_track(title, artist) -> LastFMTrack | None:
 async def get_last_fm_artist(name: str) -> LastFMArtist | None:
     async with httpx.AsyncClient() as client:
         try:
-            resp = (await client.post("https://ws.audioscrobbler.com/2.0", params={
+            resp = (await client.post(env_config.last_fm_url, params={
                 "method": "artist.getinfo",
                 "api_key": file_config.last_fm_key,
                 "artist": name,
@@ -71,7 +71,7 @@ async def get_last_fm_album(artist: str, album: str) -> dict | None:
     """Get album info from LastFM, including track listing with positions."""
     async with httpx.AsyncClient() as client:
         try:
-            resp = (await client.post("https://ws.audioscrobbler.com/2.0", params={
+            resp = (await client.post(env_config.last_fm_url, params={
                 "method": "album.getInfo",
                 "api_key": file_config.last_fm_key,
                 "artist": artist,
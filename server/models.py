@@ -77,6 +77,7 @@ class MusicIdResult(BaseModel):
     success: bool
     message: str = ""
     track: MusicIdTrack | None = None
+    plugin: str | None = None  # the plugin that answered
 
 
 class IdentifyResult(MusicIdResult):
@@ -89,12 +90,49 @@ class IdentifyResult(MusicIdResult):
     duration_seconds: float | None = None
 
 
+class PluginHealth(BaseModel):
+    name: str = ""
+    ready: bool = True
+    message: str | None = None
+
+
+class CaptureHealth(BaseModel):
+    running: bool
+    restarts: int = 0
+    callbacks: int = 0
+    input_overflows: int = 0
+    input_underflows: int = 0
+    jitter_ms: float = 0.0
+    max_jitter_ms: float = 0.0
+    clock_drift_ppm: float | None = None
+    last_error: str | None = None
+
+
+class MusicActivity(BaseModel):
+    is_music: bool
+    score: float = 0.0
+    rms: float = 0.0
+    flatness: float = 0.0
+    flux: float = 0.0
+    low_band: float = 0.0
+    mid_band: float = 0.0
+    high_band: float = 0.0
+    low_energy_ratio: float = 0.0
+    novelty: float = 0.0
+    noise_floor: float | None = None
+    enter_threshold: float | None = None
+    exit_threshold: float | None = None
+
+
 class StatusResponse(IdentifyResult):
     recorded_at: Optional[datetime] = None
     scan_ends: Optional[datetime] = None
     next_scan: Optional[datetime] = None
     lyrics: Optional[Lyrics] = None
     can_skip: bool = False
+    capture: Optional[CaptureHealth] = None
+    activity: Optional[MusicActivity] = None
+    plugins: Optional[list[PluginHealth]] = None
 
 
 class DbTrack(BaseModel):
@@ -1,15 +1,18 @@
 import asyncio
-import importlib
-import inspect
 from io import BytesIO
 from pathlib import Path
 
 import numpy as np
 import soundfile as sf
 
+from server import utils
 from server.config import env_config, file_config
+from server.dsp.resample import resample
 from server.models import MusicIdResult
 from server.music_id.base import TrackIdPlugin
+from server.music_id.hedging import LatencyTracker, identify_hedged
+from server.music_id.process_pool import get_process_pool
+from server.music_id.registry import PluginRegistry, configured_plugins, find_plugin_class
 
 
 plugins_dir = Path(__file__).parent / "plugins"
@@ -21,45 +24,70 @@ if not plugins_init.is_file():
 
 
 def load_plugin(plugin_name: str) -> TrackIdPlugin:
-    plugin_module = importlib.import_module("." + plugin_name, package="server.music_id.plugins")
-    for name, item in inspect.getmembers(plugin_module):
-        try:
-            if issubclass(item, TrackIdPlugin):
-                return item()
-        except TypeError:
-            continue
+    """ A new, not set up instance of a plugin. Use `plugin_registry` to identify tracks with it. """
+    return find_plugin_class(plugin_name)()
 
-    raise ValueError(f"Plugin {plugin_name} not found")
 
+plugin_registry = PluginRegistry()
+plugin_latency = LatencyTracker()
 
-async def recognize_raw(raw, sample_rate, downsample_to=44100):
+
+async def identify_raw(plugin_name: str, raw: np.ndarray, sample_rate: int, in_worker: bool = False) -> MusicIdResult:
+    """
+    Converts mono `raw` to the input the plugin asks for and identifies it, in a worker process if
+    `music_id_workers` is set.
+    """
+    if not in_worker and (process_pool := get_process_pool(plugin_registry.config.music_id_workers)):
+        result, health = await process_pool.identify(plugin_name, raw, sample_rate)
+        plugin_registry.worker_health[plugin_name] = health
+        return result
+
+    plugin = await plugin_registry.get(plugin_name)
+    target_rate = plugin.sample_rate or sample_rate
+    raw = resample(raw, sample_rate, target_rate)
+
+    raw_norm = 2 * (raw - raw.min()) / (raw.max() - raw.min()) - 1  # normalize
+    if plugin.channels > 1:
+        raw_norm = np.repeat(raw_norm[:, None], plugin.channels, axis=1)
+
+    if plugin.input == "pcm":
+        if plugin.is_async:
+            return await plugin.identify_pcm_async(raw_norm, target_rate)
+        else:
+            return await asyncio.to_thread(plugin.identify_pcm, raw_norm, target_rate)
+
+    audio_buffer = BytesIO()
+    sf.write(audio_buffer, raw_norm, target_rate, format=plugin.format, subtype=plugin.subtype)
+    audio_buffer.seek(0)
+
+    if plugin.is_async:
+        return await plugin.identify_track_async(audio_buffer)
+    else:
+        return await asyncio.to_thread(plugin.identify_track, audio_buffer)
+
+
+async def recognize_raw(raw, sample_rate, clip_rms: float = None, is_music: bool = True, silence_threshold: float = None):
     raw = np.array(raw, np.float32)
 
-    rms = float(np.sqrt(np.mean(raw ** 2)))
-    if rms < file_config.silence_threshold:
+    rms = clip_rms if clip_rms is not None else utils.rms(raw)
+    if rms < (silence_threshold if silence_threshold is not None else file_config.silence_threshold):
         return MusicIdResult(
             success=False,
             message=f"No sound detected. RMS: {rms}",
         )
+    elif not is_music:
+        return MusicIdResult(
+            success=False,
+            message=f"No music detected. RMS: {rms}",
+        )
     else:
-        frame_skip = sample_rate // downsample_to
-        if frame_skip >= 2:
-            raw = raw[::frame_skip]
-
-        # Convert multi-channel to mono by averaging channels
+        # Convert multi-channel to mono by averaging channels, before resampling so it only runs once
         if raw.ndim >= 2:
             # Shape is [samples, channels], average across channels (axis=1)
             raw = np.mean(raw, axis=1)
 
-        raw_norm = 2 * (raw - raw.min()) / (raw.max() - raw.min()) - 1  # normalize
-
-        plugin = load_plugin(file_config.music_id_plugin)
-
-        audio_buffer = BytesIO()
-        sf.write(audio_buffer, raw_norm, int(sample_rate / frame_skip), format=plugin.format, subtype=plugin.subtype)
-        audio_buffer.seek(0)
-
-        if plugin.is_async:
-            return await plugin.identify_track_async(audio_buffer)
-        else:
-            return await asyncio.to_thread(plugin.identify_track, audio_buffer)
+        return await identify_hedged(
+            await plugin_registry.sync(),
+            lambda plugin_name: identify_raw(plugin_name, raw, sample_rate),
+            plugin_latency,
+        )
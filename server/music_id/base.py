@@ -1,22 +1,53 @@
 from io import BytesIO
+from typing import Literal
 
-from server.models import BaseModel, MusicIdResult
+import numpy as np
+
+from server.models import BaseModel, MusicIdResult, PluginHealth
 
 
 class TrackIdPlugin:
     is_async: bool
+    # "file" plugins get the clip encoded with `format`/`subtype` through identify_track(_async), "pcm" plugins
+    # get it as a float32 array through identify_pcm(_async), with no encoding at all
+    input: Literal["file", "pcm"] = "file"
     format: str = "OGG"
     subtype: str | None = "VORBIS"
+    sample_rate: int | None = None  # rate the audio is resampled to before encoding, None keeps the capture rate
+    channels: int = 1
     requirements: list[str] = []
 
     class PluginOptions(BaseModel):
         pass
 
     def __init__(self, options: PluginOptions = None):
-        self.options = options or TrackIdPlugin.PluginOptions()
+        self.options = options or self.PluginOptions()
+
+    async def setup(self):
+        """ Called once before the plugin's first identification, e.g. to open clients and connections. """
+
+    @classmethod
+    def setup_recorder(cls):
+        """
+        Called once in the recorder when the plugin is configured, even if it runs in worker processes, for
+        what only one process should do however many workers there are.
+        """
+
+    async def aclose(self):
+        """ Called when the plugin is no longer used, to release what `setup` opened. """
+
+    def health(self) -> PluginHealth:
+        return PluginHealth()
 
     def identify_track(self, audio: BytesIO) -> MusicIdResult:
         raise NotImplementedError
 
     async def identify_track_async(self, audio: BytesIO) -> MusicIdResult:
         raise NotImplementedError
+
+    def identify_pcm(self, audio: np.ndarray, sample_rate: int) -> MusicIdResult:
+        """ `audio` is float32, shaped (frames,) for one channel and (frames, channels) for more. """
+        raise NotImplementedError
+
+    async def identify_pcm_async(self, audio: np.ndarray, sample_rate: int) -> MusicIdResult:
+        raise NotImplementedError
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import numpy as np
+
+from server.dsp.chroma import chroma_profile
+from server.models import IdentifyResult
+
+
+class TrackContinuity:
+    """
+    Answers scans locally while the last identified track is evidently still playing, instead of asking
+    the music id plugin again.
+
+    A scan is answered locally only if no abrupt change was detected in the audio since the track was last
+    identified by the plugin, the expected offset is still inside the track, the clip's chroma profile
+    correlates with the track's, and the plugin was asked within the last `max_seconds`.
+    """
+
+    min_similarity = 0.8
+
+    def __init__(self, sample_rate: int, max_seconds: float):
+        self.sample_rate = sample_rate
+        self.max_seconds = max_seconds
+
+        self.result: IdentifyResult | None = None
+        self.track_guid: str | None = None
+        self.identified_at: datetime | None = None
+        self.changes = 0
+
+        self.profile: np.ndarray | None = None
+        self.clips = 0
+
+    def identified(self, result: IdentifyResult, track_guid: str, clip: np.ndarray, changes: int):
+        """ Remembers a track the plugin identified, and the clip it was identified from. """
+        profile = chroma_profile(clip, self.sample_rate)
+        if track_guid == self.track_guid and self.profile is not None:
+            # average over every clip of the track, which is closer to the whole song's profile
+            profile = self.profile * self.clips + profile
+            profile /= np.linalg.norm(profile) + 1e-12
+            self.clips += 1
+        else:
+            self.clips = 1
+
+        self.result = result
+        self.track_guid = track_guid
+        self.identified_at = result.recorded_at
+        self.changes = changes
+        self.profile = profile
+
+    def reset(self):
+        self.result = self.track_guid = self.profile = None
+
+    def check(self, clip: np.ndarray, recorded_at: datetime, rms: float, changes: int) -> IdentifyResult | None:
+        """ Returns the current track at the clip's offset if the clip is consistent with it, otherwise None. """
+        if self.result is None or changes != self.changes:
+            return None
+        elif (recorded_at - self.identified_at).total_seconds() > self.max_seconds:
+            return None
+
+        offset = (recorded_at - self.result.started_at).total_seconds()
+        clip_seconds = len(clip) / self.sample_rate
+        if self.result.duration_seconds and offset + clip_seconds > self.result.duration_seconds:
+            return None
+
+        similarity = float(chroma_profile(clip, self.sample_rate) @ self.profile)
+        if similarity < self.min_similarity:
+            return None
+
+        result = self.result.model_copy(deep=True)
+        result.recorded_at = recorded_at
+        result.rms = rms
+        result.track.offset = offset
+        result.message = f"Confirmed locally (chroma similarity {similarity:.2f})"
+        return result
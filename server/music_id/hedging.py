@@ -0,0 +1,92 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from server.logger import logger
+from server.models import MusicIdResult
+
+
+class LatencyTracker:
+    """ Recent response times of each plugin, for deciding how long to wait before hedging. """
+
+    default_delay = 3.0  # until a plugin has answered `min_samples` times
+    min_delay = 0.5
+    min_samples = 5
+
+    def __init__(self, samples: int = 50):
+        self.samples: dict[str, deque[float]] = {}
+        self.max_samples = samples
+
+    def record(self, plugin_name: str, seconds: float):
+        self.samples.setdefault(plugin_name, deque(maxlen=self.max_samples)).append(seconds)
+
+    def hedge_delay(self, plugin_name: str) -> float:
+        """ The plugin's p95 response time: waiting longer than that, it's probably having a slow moment. """
+        samples = self.samples.get(plugin_name)
+        if not samples or len(samples) < self.min_samples:
+            return self.default_delay
+
+        return max(self.min_delay, float(np.percentile(samples, 95)))
+
+
+async def identify_hedged(
+        plugin_names: list[str],
+        identify: Callable[[str], Awaitable[MusicIdResult]],
+        latency: LatencyTracker,
+) -> MusicIdResult:
+    """
+    Asks the plugins in order of preference, returning the first successful result and cancelling the
+    rest. The next plugin is asked when the ones asked so far have all failed, or haven't answered within
+    the p95 response time of the last one asked.
+    """
+    tasks: dict[asyncio.Task, tuple[str, float]] = {}
+    next_plugin = 0
+    last_result = MusicIdResult(success=False, message="No music id plugins configured")
+
+    def start_next():
+        nonlocal next_plugin
+        name = plugin_names[next_plugin]
+        next_plugin += 1
+        tasks[asyncio.create_task(identify(name))] = (name, time.perf_counter())
+
+    if plugin_names:
+        start_next()
+
+    try:
+        while tasks:
+            if next_plugin < len(plugin_names):
+                timeout = latency.hedge_delay(plugin_names[next_plugin - 1])
+            else:
+                timeout = None
+
+            done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                name, started_at = tasks.pop(task)
+                latency.record(name, time.perf_counter() - started_at)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.warning(f"Music id plugin {name} failed: {e}")
+                    result = MusicIdResult(success=False, message=str(e))
+
+                result.plugin = name
+                if result.success:
+                    return result
+
+                last_result = result
+
+            # hedge if the plugins asked so far are slow, or start the next one if they've all failed
+            if next_plugin < len(plugin_names) and (not done or not tasks):
+                if not done:
+                    logger.info(f"No answer from {', '.join(name for name, _ in tasks.values())} yet, also asking {plugin_names[next_plugin]}")
+                start_next()
+
+        return last_result
+
+    finally:
+        for task in tasks:
+            task.cancel()  # plugins running in a thread finish in the background, their result is dropped
@@ -0,0 +1,328 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+from mutagen.flac import FLAC
+
+from server.config import env_config
+from server.dsp import landmarks
+from server.dsp.resample import StreamResampler
+from server.logger import logger
+from server.models import BaseModel
+
+
+class LibraryTrack(BaseModel):
+    path: str  # relative to the library
+    mtime: float
+    size: int
+    title: str
+    artist: str | None = None
+    album: str | None = None
+    track_no: int | None = None
+    duration_seconds: float
+    removed: bool = False
+
+
+class LibraryMatch(BaseModel):
+    track: LibraryTrack
+    offset: float  # seconds into the track where the clip starts
+    matches: int  # landmarks agreeing on the offset
+    landmarks: int  # landmarks in the clip
+
+
+class Segment:
+    """ Part of the inverted index: every landmark of some tracks, as memory-mapped arrays sorted by hash. """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.hashes = np.load(path / "hashes.npy", mmap_mode="r")
+        self.tracks = np.load(path / "tracks.npy", mmap_mode="r")
+        self.times = np.load(path / "times.npy", mmap_mode="r")
+
+    @staticmethod
+    def write(path: Path, hashes: np.ndarray, tracks: np.ndarray, times: np.ndarray) -> "Segment":
+        order = np.argsort(hashes, kind="stable")
+        tmp_path = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        tmp_path.mkdir(parents=True)
+
+        np.save(tmp_path / "hashes.npy", hashes[order])
+        np.save(tmp_path / "tracks.npy", tracks[order])
+        np.save(tmp_path / "times.npy", times[order])
+        tmp_path.rename(path)  # readers never see a half-written segment
+        return Segment(path)
+
+
+class LibraryIndex:
+    """
+    Inverted index from landmark hash to (track, time) over every FLAC in a music library, for identifying
+    clips without the network.
+
+    New and changed files are indexed into a new segment instead of rewriting the whole index, and the
+    segments are merged once there are more than `max_segments` of them. `tracks.json` lists the indexed
+    files; removed files are only flagged there until the next merge.
+
+    A `read_only` index never writes, and `reload` picks up what the process refreshing it has indexed.
+    """
+
+    max_segments = 8
+    max_hits = 2000  # landmarks more common than this say little about which track is playing
+    min_matches = 8
+
+    def __init__(self, directory: Path, library_dir: Path, read_only: bool = False):
+        self.directory = directory
+        self.library_dir = library_dir
+        self.read_only = read_only
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()  # one refresh at a time
+
+        self.tracks: list[LibraryTrack] = []
+        self.segments: list[Segment] = []
+        self.loaded_mtime: float | None = None  # of tracks.json when it was last loaded
+        self.load()
+
+    @property
+    def tracks_path(self) -> Path:
+        return self.directory / "tracks.json"
+
+    def load(self):
+        tracks = []
+        if self.tracks_path.is_file():
+            self.loaded_mtime = self.tracks_path.stat().st_mtime
+            tracks = [LibraryTrack.model_validate(track) for track in json.loads(self.tracks_path.read_text())]
+
+        if not self.read_only:
+            for path in self.directory.glob("*.tmp"):
+                shutil.rmtree(path, ignore_errors=True)  # left over from a crash mid-write
+
+        self.tracks, self.segments = tracks, [Segment(path) for path in sorted(self.directory.glob("segment_*"))]
+
+    def reload(self):
+        """ Loads the index again if `tracks.json` changed since it was last loaded. """
+        try:
+            if self.tracks_path.stat().st_mtime == self.loaded_mtime:
+                return
+            self.load()
+        except (OSError, ValueError) as e:
+            # e.g. a merge removing the segments being loaded, the next reload tries again
+            self.loaded_mtime = None
+            logger.warning(f"Failed to reload the music library index: {e}")
+
+    def _save_tracks(self, tracks: list[LibraryTrack]):
+        tmp_path = self.tracks_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps([track.model_dump() for track in tracks]))
+        os.replace(tmp_path, self.tracks_path)
+
+    def _next_segment_path(self) -> Path:
+        last = int(self.segments[-1].path.name.split("_")[1]) if self.segments else 0
+        return self.directory / f"segment_{last + 1:06d}"
+
+    @staticmethod
+    def fingerprint(path: Path, block_frames: int = 65536) -> tuple[np.ndarray, np.ndarray, float]:
+        """
+        Returns the landmark (hashes, times) of an audio file, and its duration. The file is decoded a block
+        at a time, so only the mono `landmarks.SAMPLE_RATE` audio of a long mix is ever held whole.
+        """
+        with sf.SoundFile(path) as audio_file:
+            resampler = StreamResampler(audio_file.samplerate, landmarks.SAMPLE_RATE)
+            parts = [
+                resampler.process(block.mean(axis=1))
+                for block in audio_file.blocks(block_frames, dtype="float32", always_2d=True)
+            ]
+            duration = resampler.frames_in / audio_file.samplerate
+            parts.append(resampler.flush())
+
+        hashes, times = landmarks.landmark_hashes(np.concatenate(parts))
+        return hashes, times, duration
+
+    @staticmethod
+    def _read_tags(path: Path) -> dict:
+        try:
+            tags = FLAC(path)
+        except Exception:
+            return {}
+
+        track_no = (tags.get("tracknumber") or [""])[0].split("/")[0]
+        return {
+            "title": (tags.get("title") or [None])[0],
+            "artist": (tags.get("artist") or [None])[0],
+            "album": (tags.get("album") or [None])[0],
+            "track_no": int(track_no) if track_no.isdigit() else None,
+        }
+
+    def refresh(self) -> int:
+        """ Indexes files added to or changed in the library since the last refresh. Returns how many. """
+        with self.lock:
+            tracks = [track.model_copy() for track in self.tracks]
+            indexed = {track.path: track for track in tracks if not track.removed}
+
+            on_disk = {}
+            for path in self.library_dir.rglob("*.flac"):
+                stat = path.stat()
+                on_disk[str(path.relative_to(self.library_dir))] = (path, stat.st_mtime, stat.st_size)
+
+            for rel_path, track in indexed.items():
+                if rel_path not in on_disk or on_disk[rel_path][1:] != (track.mtime, track.size):
+                    track.removed = True
+
+            new_files = [
+                (rel_path, *file) for rel_path, file in on_disk.items()
+                if rel_path not in indexed or indexed[rel_path].removed
+            ]
+
+            all_hashes, all_tracks, all_times = [], [], []
+            for rel_path, path, mtime, size in new_files:
+                try:
+                    hashes, times, duration = self.fingerprint(path)
+                except Exception as e:
+                    logger.warning(f"Failed to index {path}: {e}")
+                    continue
+
+                tags = self._read_tags(path)
+                tracks.append(LibraryTrack(
+                    path=rel_path,
+                    mtime=mtime,
+                    size=size,
+                    title=tags.get("title") or path.stem,
+                    artist=tags.get("artist"),
+                    album=tags.get("album"),
+                    track_no=tags.get("track_no"),
+                    duration_seconds=duration,
+                ))
+                all_hashes.append(hashes)
+                all_tracks.append(np.full(len(hashes), len(tracks) - 1, np.uint32))
+                all_times.append(times)
+
+            segments = list(self.segments)
+            if all_hashes:
+                segments.append(Segment.write(
+                    self._next_segment_path(),
+                    np.concatenate(all_hashes),
+                    np.concatenate(all_tracks),
+                    np.concatenate(all_times),
+                ))
+
+            self._save_tracks(tracks)
+            self.tracks, self.segments = tracks, segments
+
+            if len(self.segments) > self.max_segments:
+                self.merge()
+
+            return len(all_hashes)
+
+    def merge(self):
+        """ Merges every segment into one, dropping the landmarks of removed tracks. """
+        old_segments = self.segments
+        removed = np.array([track.removed for track in self.tracks], bool)
+
+        hashes = np.concatenate([segment.hashes for segment in old_segments])
+        tracks = np.concatenate([segment.tracks for segment in old_segments])
+        times = np.concatenate([segment.times for segment in old_segments])
+        keep = ~removed[tracks]
+
+        self.segments = [Segment.write(self._next_segment_path(), hashes[keep], tracks[keep], times[keep])]
+        for segment in old_segments:
+            shutil.rmtree(segment.path, ignore_errors=True)  # open memory maps stay readable until closed
+
+    def match(self, audio: np.ndarray) -> LibraryMatch | None:
+        """ Finds the track and offset of mono `landmarks.SAMPLE_RATE` audio. """
+        query_hashes, query_times = landmarks.landmark_hashes(audio)
+        tracks, segments = self.tracks, self.segments
+        if not len(query_hashes) or not segments:
+            return None
+
+        hit_tracks, hit_offsets = [], []
+        for segment in segments:
+            lo = np.searchsorted(segment.hashes, query_hashes, "left")
+            hi = np.searchsorted(segment.hashes, query_hashes, "right")
+            counts = np.where(hi - lo <= self.max_hits, hi - lo, 0)
+            total = int(counts.sum())
+            if not total:
+                continue
+
+            # every index from lo to hi of each query landmark, flattened
+            first_hit = np.repeat(lo - (np.cumsum(counts) - counts), counts)
+            hits = first_hit + np.arange(total)
+
+            hit_tracks.append(segment.tracks[hits].astype(np.int64))
+            hit_offsets.append(segment.times[hits].astype(np.int64) - np.repeat(query_times.astype(np.int64), counts))
+
+        if not hit_tracks:
+            return None
+
+        hit_tracks, hit_offsets = np.concatenate(hit_tracks), np.concatenate(hit_offsets)
+        removed = np.array([track.removed for track in tracks], bool)
+        keep = ~removed[hit_tracks]
+
+        # vote for (track, offset) pairs, the true one gets most of the landmarks
+        keys = (hit_tracks[keep] << 32) | (hit_offsets[keep] + (1 << 31))
+        if not len(keys):
+            return None
+
+        values, votes = np.unique(keys, return_counts=True)
+        best = int(np.argmax(votes))
+        if votes[best] < self.min_matches:
+            return None
+
+        track = int(values[best] >> 32)
+        offset_frames = int(values[best] & 0xFFFFFFFF) - (1 << 31)
+        return LibraryMatch(
+            track=tracks[track],
+            offset=offset_frames * landmarks.FRAME_SECONDS,
+            matches=int(votes[best]),
+            landmarks=len(query_hashes),
+        )
+
+
+_library_index: LibraryIndex | None = None
+_library_index_lock = threading.Lock()
+_refresh_here = True  # False in music id worker processes, which only read what the recorder indexes
+
+
+def follow_library_index():
+    """ Makes this process only read the index, reloading it as the recorder keeps it up to date. """
+    global _refresh_here
+    _refresh_here = False
+
+
+def run_library_refresh(index: LibraryIndex, interval: float):
+    while True:
+        try:
+            if added := index.refresh():
+                logger.info(f"Indexed {added} new file(s) in the music library")
+        except Exception as e:
+            logger.warning(f"Failed to refresh the music library index: {e}")
+
+        time.sleep(interval)
+
+
+def get_library_index(refresh_interval: float = 60) -> LibraryIndex:
+    """
+    The index of `env_config.music_library_dir`, kept up to date by a background thread, or after
+    `follow_library_index` reloaded from disk when another process updated it.
+    """
+    global _library_index
+
+    with _library_index_lock:
+        if _library_index is None:
+            _library_index = LibraryIndex(
+                env_config.appdata_dir / "library_index",
+                env_config.music_library_dir,
+                read_only=not _refresh_here,
+            )
+            if _refresh_here:
+                threading.Thread(
+                    target=run_library_refresh,
+                    args=(_library_index, refresh_interval),
+                    daemon=True
+                ).start()
+
+        elif not _refresh_here:
+            _library_index.reload()
+
+        return _library_index
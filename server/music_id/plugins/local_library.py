@@ -0,0 +1,48 @@
+import numpy as np
+
+from server.dsp import landmarks
+from server.models import MusicIdResult, MusicIdTrack, PluginHealth
+from server.music_id.base import TrackIdPlugin
+from server.music_id.library_index import get_library_index
+
+
+class LocalLibraryPlugin(TrackIdPlugin):
+    """ Identifies tracks saved to the music library with the rip tool, without the network. """
+
+    is_async = False
+    input = "pcm"
+    sample_rate = landmarks.SAMPLE_RATE
+
+    async def setup(self):
+        get_library_index()  # loads the index and starts keeping it up to date
+
+    @classmethod
+    def setup_recorder(cls):
+        get_library_index()  # the recorder indexes the library, worker processes only reload it
+
+    def health(self) -> PluginHealth:
+        tracks = sum(not track.removed for track in get_library_index().tracks)
+        return PluginHealth(ready=tracks > 0, message=f"{tracks} tracks indexed")
+
+    def identify_pcm(self, audio: np.ndarray, sample_rate: int) -> MusicIdResult:
+        match = get_library_index().match(audio)
+        if match is None:
+            return MusicIdResult(
+                success=False,
+                message="No match found in the music library",
+            )
+
+        track = match.track
+        return MusicIdResult(
+            success=True,
+            message=f"{match.matches} of {match.landmarks} landmarks matched",
+            track=MusicIdTrack(
+                track_id=track.path,
+                offset=match.offset,
+                track_name=track.title,
+                artist_name=track.artist,
+                album_name=track.album,
+                track_no=track.track_no,
+                duration_seconds=track.duration_seconds,
+            )
+        )
@@ -1,6 +1,6 @@
 from io import BytesIO
 
-from server.models import MusicIdResult, BaseModel, MusicIdTrack
+from server.models import MusicIdResult, BaseModel, MusicIdTrack, PluginHealth
 from server.music_id.base import TrackIdPlugin
 
 
@@ -20,16 +20,63 @@ class ShazamTrack(BaseModel):
     released: str | None = None
 
 
+class PooledHttpClient:
+    """
+    Stands in for shazamio's HTTPClient, which opens a new session (and connection) for every request,
+    with one session kept open for the plugin's lifetime.
+    """
+
+    def __init__(self, attempts: int = 3):
+        from aiohttp_retry import ExponentialRetry, RetryClient
+
+        self.client = RetryClient(
+            retry_options=ExponentialRetry(attempts=attempts, statuses={500, 502, 503, 504, 429}),
+            raise_for_status=False,
+        )
+
+    async def request(self, method: str, url: str, *args, **kwargs):
+        from shazamio.utils import validate_json
+
+        async with self.client.request(method.upper(), url, **kwargs) as resp:
+            return await validate_json(resp, *args)
+
+    async def close(self):
+        await self.client.close()
+
+
 class ShazamPlugin(TrackIdPlugin):
     is_async = True
+    # shazamio decodes the file again to compute the signature, and only the signature is uploaded, so
+    # there's no point compressing it
+    format = "WAV"
+    subtype = "PCM_16"
+    sample_rate = 16000  # shazamio converts everything to 16 kHz mono before fingerprinting
     requirements = [
         "shazamio==0.8.1"
     ]
 
-    async def identify_track_async(self, audio: BytesIO) -> MusicIdResult:
+    http_client: PooledHttpClient | None = None
+    shazam = None
+
+    async def setup(self):
         from shazamio import Shazam
 
-        raw_result = await Shazam().recognize(audio.getvalue())
+        self.http_client = PooledHttpClient()
+        self.shazam = Shazam(http_client=self.http_client)
+
+    async def aclose(self):
+        if self.http_client:
+            await self.http_client.close()
+            self.http_client = self.shazam = None
+
+    def health(self) -> PluginHealth:
+        return PluginHealth(ready=self.shazam is not None)
+
+    async def identify_track_async(self, audio: BytesIO) -> MusicIdResult:
+        if self.shazam is None:
+            await self.setup()
+
+        raw_result = await self.shazam.recognize(audio.getvalue())
         matches = raw_result.get("matches", [])
         if not matches:
             return MusicIdResult(
@@ -0,0 +1,123 @@
+import asyncio
+import random
+import time
+from io import BytesIO
+
+import httpx
+
+from server.models import BaseModel, MusicIdResult, MusicIdTrack, PluginHealth
+from server.music_id.base import TrackIdPlugin
+
+
+class StubResponse(BaseModel):
+    track: MusicIdTrack | None = None  # None answers that nothing matched
+    repeat: int = 1  # answered this many times in a row, as if the track kept playing
+    latency_seconds: float | None = None  # instead of the script's latency
+    error: str | None = None  # fail with this instead of answering
+
+
+class StubScript(BaseModel):
+    """
+    Scripted answers for load testing the recorder without a real identification service. The responses
+    are given in turn, starting over after the last one, each with the script's latency and failure rate.
+    """
+    responses: list[StubResponse] = []
+    latency_seconds: float = 0.5
+    latency_jitter_seconds: float = 0.0
+    failure_rate: float = 0.0  # share of requests that fail on top of the scripted errors
+    seed: int = 0
+
+
+class StubPlayer:
+    """ Plays a StubScript back, one answer per request. """
+
+    def __init__(self, script: StubScript):
+        self.script = script
+        self.random = random.Random(script.seed)
+        self.requests = 0
+        self._answered = 0  # answers given from the current response
+        self._response = 0
+        self._first_answered_at = 0.0
+
+    def next_response(self) -> StubResponse | None:
+        """ The response due now, advancing the offset of a repeated track by the time since it was first given. """
+        responses = self.script.responses
+        self.requests += 1
+        if not responses:
+            return None
+
+        if self._answered >= responses[self._response].repeat:
+            self._response = (self._response + 1) % len(responses)
+            self._answered = 0
+
+        response = responses[self._response]
+        if self._answered == 0:
+            self._first_answered_at = time.monotonic()
+        self._answered += 1
+
+        if response.track is None:
+            return response
+
+        offset = response.track.offset + time.monotonic() - self._first_answered_at
+        return response.model_copy(update={"track": response.track.model_copy(update={"offset": offset})})
+
+    async def answer(self) -> MusicIdResult:
+        response = self.next_response()
+
+        latency = self.script.latency_seconds
+        if response is not None and response.latency_seconds is not None:
+            latency = response.latency_seconds
+        await asyncio.sleep(max(0.0, latency + self.random.uniform(-1, 1) * self.script.latency_jitter_seconds))
+
+        if response is not None and response.error:
+            raise RuntimeError(response.error)
+        elif self.random.random() < self.script.failure_rate:
+            raise RuntimeError("Stub failure")
+        elif response is None or response.track is None:
+            return MusicIdResult(success=False, message="No match found")
+
+        return MusicIdResult(success=True, message="Stub match", track=response.track)
+
+
+class StubPlugin(TrackIdPlugin):
+    """
+    Answers from a StubScript, for running the recorder end to end without the network (see
+    `server/replay.py` for audio without a sound card). With `url`, the answers come from
+    `scripts/stub_server.py` instead, so the HTTP round trip is part of the test too.
+    """
+
+    is_async = True
+    format = "WAV"
+    subtype = "PCM_16"
+    sample_rate = 16000
+
+    class PluginOptions(StubScript):
+        url: str | None = None
+
+    player: StubPlayer | None = None
+    client: httpx.AsyncClient | None = None
+
+    async def setup(self):
+        if self.options.url:
+            self.client = httpx.AsyncClient(base_url=self.options.url, timeout=30)
+        else:
+            self.player = StubPlayer(self.options)
+
+    async def aclose(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    def health(self) -> PluginHealth:
+        if self.client:
+            return PluginHealth(ready=True, message=f"Answering from {self.options.url}")
+
+        return PluginHealth(ready=self.player is not None, message=f"{self.player.requests if self.player else 0} requests answered")
+
+    async def identify_track_async(self, audio: BytesIO) -> MusicIdResult:
+        if self.client is None:
+            return await self.player.answer()
+
+        resp = await self.client.post("/identify", content=audio.read(), headers={"Content-Type": "audio/wav"})
+        resp.raise_for_status()
+        return MusicIdResult.model_validate_json(resp.content)
@@ -0,0 +1,135 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from server.logger import logger
+from server.models import MusicIdResult, PluginHealth
+
+_worker_loop: asyncio.AbstractEventLoop | None = None
+
+
+def _init_worker():
+    try:
+        # the recorder runs real-time (run.sh), which workers would inherit and starve capture with
+        os.sched_setscheduler(0, os.SCHED_OTHER, os.sched_param(0))
+    except (AttributeError, OSError) as e:
+        logger.warning(f"Failed to reset the music id worker's scheduling policy: {e}")
+
+    from server.music_id import plugin_registry
+    from server.music_id.library_index import follow_library_index
+
+    global _worker_loop
+    # one loop for the worker's lifetime, so the plugins it sets up (and their connections) stay usable
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    follow_library_index()  # the recorder keeps the index up to date, so workers don't race it
+    plugin_registry.in_worker = True
+
+    # set the plugins up now rather than on the first clip, which has to be identified in time. An error
+    # here would break the whole pool, so the first clip gets to report it instead
+    try:
+        plugin_names = _worker_loop.run_until_complete(plugin_registry.sync())
+    except Exception as e:
+        logger.warning(f"Failed to load the music id settings in a worker: {e}")
+        plugin_names = []
+
+    for plugin_name in plugin_names:
+        try:
+            _worker_loop.run_until_complete(plugin_registry.get(plugin_name))
+        except Exception as e:
+            logger.warning(f"Failed to set up music id plugin {plugin_name}: {e}")
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _identify_in_worker(plugin_name: str, shm_name: str, frames: int, sample_rate: int) -> tuple[dict, dict]:
+    from server.music_id import identify_raw, plugin_registry
+
+    # spawned workers share the recorder's resource tracker, which already knows the segment, so
+    # attaching doesn't need undoing like in SharedCircularBufferClient
+    shm = SharedMemory(shm_name)
+    try:
+        raw = np.ndarray((frames,), np.float32, shm.buf).copy()
+    finally:
+        shm.close()
+
+    _worker_loop.run_until_complete(plugin_registry.sync())  # picks up settings changed since the last clip
+    result = _worker_loop.run_until_complete(identify_raw(plugin_name, raw, sample_rate, in_worker=True))
+
+    plugin = plugin_registry.plugins.get(plugin_name)
+    health = plugin.health() if plugin else PluginHealth(ready=False, message="Not set up")
+    return result.model_dump(), health.model_copy(update={"name": plugin_name}).model_dump()
+
+
+class PluginProcessPool:
+    """
+    Persistent worker processes that resample, encode and identify clips, so CPU-heavy plugins run on
+    other cores instead of competing for the recorder's GIL with capture and live stats. Each worker
+    keeps its own warm plugin instances, and clips are handed over through shared memory.
+
+    Workers reload the settings before each clip and send the plugin's health back with its result.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        # spawned, since forking the recorder would copy its capture and stats threads' locks mid-use
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    async def identify(self, plugin_name: str, raw: np.ndarray, sample_rate: int) -> tuple[MusicIdResult, PluginHealth]:
+        shm = SharedMemory(create=True, size=max(1, raw.nbytes))
+        np.ndarray(raw.shape, np.float32, shm.buf)[:] = raw
+
+        def release(_):
+            shm.close()
+            shm.unlink()
+
+        # released once the worker is done with it, even if the caller stopped waiting (e.g. hedging cancelled it)
+        future = self.executor.submit(_identify_in_worker, plugin_name, shm.name, len(raw), sample_rate)
+        future.add_done_callback(release)
+
+        result, health = await asyncio.wrap_future(future)
+        return MusicIdResult.model_validate(result), PluginHealth.model_validate(health)
+
+    def warm_up(self):
+        """ Starts every worker without waiting for them, since they only start on demand otherwise. """
+        for _ in range(self.workers):
+            self.executor.submit(_worker_ready)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_process_pool: PluginProcessPool | None = None
+
+
+def shutdown_process_pool():
+    global _process_pool
+
+    if _process_pool is not None:
+        _process_pool.shutdown()
+        _process_pool = None
+
+
+def get_process_pool(workers: int) -> PluginProcessPool | None:
+    """ The pool with `workers` workers, replacing the pool if the setting changed. None if `workers` is 0. """
+    global _process_pool
+
+    if _process_pool is not None and _process_pool.workers != workers:
+        shutdown_process_pool()
+
+    if workers > 0 and _process_pool is None:
+        logger.info(f"Starting {workers} music id worker process(es)")
+        _process_pool = PluginProcessPool(workers)
+        _process_pool.warm_up()
+
+    return _process_pool
@@ -0,0 +1,138 @@
+import asyncio
+import importlib
+import inspect
+
+from server.config import FileConfig, config_fp, file_config
+from server.logger import logger
+from server.models import PluginHealth
+from server.music_id.base import TrackIdPlugin
+
+
+def find_plugin_class(plugin_name: str) -> type[TrackIdPlugin]:
+    plugin_module = importlib.import_module("." + plugin_name, package="server.music_id.plugins")
+    for name, item in inspect.getmembers(plugin_module):
+        try:
+            if issubclass(item, TrackIdPlugin) and item is not TrackIdPlugin:
+                return item
+        except TypeError:
+            continue
+
+    raise ValueError(f"Plugin {plugin_name} not found")
+
+
+def configured_plugins(config: FileConfig = file_config) -> list[str]:
+    """ Names of the plugins to identify tracks with, in order of preference. Empty until one is chosen. """
+    return [name for name in config.music_id_plugins or [config.music_id_plugin] if name]
+
+
+class PluginRegistry:
+    """
+    Keeps one set up instance of each configured plugin, so their clients and connections are reused
+    between scans. Plugins are closed and set up again only when their settings change.
+
+    The plugin classes are looked up when the configured plugins change, not on every scan.
+    """
+
+    def __init__(self, in_worker: bool = False):
+        self.config = file_config
+        self.config_mtime: float | None = None
+        self.in_worker = in_worker  # in a music id worker process rather than the recorder
+
+        self.plugin_names: list[str] = []  # the configured plugins when their classes were last looked up
+        self.plugin_classes: dict[str, type[TrackIdPlugin]] = {}  # of those that load
+        self.plugins: dict[str, TrackIdPlugin] = {}
+        self.options: dict[str, dict] = {}  # the options each plugin was set up with
+        self.worker_health: dict[str, PluginHealth] = {}  # of the plugins running in worker processes
+        self.lock = asyncio.Lock()
+
+    def _reload_config(self) -> bool:
+        try:
+            mtime = config_fp.stat().st_mtime
+        except FileNotFoundError:
+            return False
+
+        if mtime != self.config_mtime:
+            self.config = FileConfig.load()
+            self.config_mtime = mtime
+            return True
+
+        return False
+
+    async def sync(self) -> list[str]:
+        """ Picks up changed settings, closing plugins that were removed or reconfigured. Returns the plugin names. """
+        async with self.lock:
+            reloaded = self._reload_config()
+            plugin_names = configured_plugins(self.config)
+
+            for name in list(self.plugins):
+                if name not in plugin_names or self.options[name] != self.config.music_id_plugin_options.get(name, {}):
+                    await self._close(name)
+
+            for name in list(self.worker_health):
+                if name not in plugin_names:
+                    del self.worker_health[name]
+
+            if reloaded or plugin_names != self.plugin_names:
+                self._find_classes(plugin_names)
+
+            return plugin_names
+
+    def _find_classes(self, plugin_names: list[str]):
+        plugin_classes = {}
+        for name in plugin_names:
+            try:
+                plugin_cls = self.plugin_classes.get(name) or find_plugin_class(name)
+                if name not in self.plugin_classes and not self.in_worker:
+                    plugin_cls.setup_recorder()
+            except Exception as e:
+                logger.warning(f"Failed to load music id plugin {name}: {e}")
+                continue
+
+            plugin_classes[name] = plugin_cls
+
+        self.plugin_classes = plugin_classes
+        self.plugin_names = plugin_names
+
+    def sample_rate(self, default: int) -> int:
+        """
+        The rate the first configured plugin that loads wants its audio at, as of the last `sync`, or `default`
+        if there are none or it takes any rate. The plugins after it resample from this rate.
+        """
+        for plugin_cls in self.plugin_classes.values():
+            return plugin_cls.sample_rate or default
+
+        return default
+
+    async def get(self, plugin_name: str) -> TrackIdPlugin:
+        async with self.lock:
+            if plugin_name not in self.plugins:
+                plugin_cls = self.plugin_classes.get(plugin_name) or find_plugin_class(plugin_name)
+                options = self.config.music_id_plugin_options.get(plugin_name, {})
+
+                plugin = plugin_cls(plugin_cls.PluginOptions.model_validate(options))
+                await plugin.setup()
+                logger.info(f"Music id plugin {plugin_name} ready")
+
+                self.plugins[plugin_name] = plugin
+                self.options[plugin_name] = options
+
+            return self.plugins[plugin_name]
+
+    async def _close(self, plugin_name: str):
+        plugin = self.plugins.pop(plugin_name)
+        self.options.pop(plugin_name)
+        try:
+            await plugin.aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close music id plugin {plugin_name}: {e}")
+
+    async def aclose(self):
+        async with self.lock:
+            for name in list(self.plugins):
+                await self._close(name)
+
+    def health(self) -> list[PluginHealth]:
+        health = {name: plugin.health().model_copy(update={"name": name}) for name, plugin in list(self.plugins.items())}
+        return list(health.values()) + [
+            plugin_health for name, plugin_health in list(self.worker_health.items()) if name not in health
+        ]
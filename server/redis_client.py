@@ -1,26 +1,63 @@
-import time
-from datetime import timedelta
+import asyncio
+from weakref import WeakKeyDictionary
 
-from redis import Redis
+from redis import ConnectionPool, Redis
+from redis.asyncio import ConnectionPool as AsyncConnectionPool, Redis as AsyncRedis
 from server.config import env_config
-from server.utils import utcnow
+
+
+# clients are cheap, connections aren't, so every client in the process shares one pool (redis-py gives a
+# forked child a fresh one)
+connection_pool = ConnectionPool(host=env_config.redis_host, port=env_config.redis_port, decode_responses=True)
+
+# asyncio connections belong to the loop that opened them, so there's a pool per event loop
+async_connection_pools: WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncConnectionPool] = WeakKeyDictionary()
 
 
 def get_redis():
-    return Redis(host=env_config.redis_host, port=env_config.redis_port, decode_responses=True)
+    return Redis(connection_pool=connection_pool)
+
+
+def get_async_redis():
+    loop = asyncio.get_running_loop()
+    if (pool := async_connection_pools.get(loop)) is None:
+        pool = async_connection_pools[loop] = AsyncConnectionPool(
+            host=env_config.redis_host,
+            port=env_config.redis_port,
+            decode_responses=True,
+        )
+
+    return AsyncRedis(connection_pool=pool)
+
+
+STATUS_CHANNEL = "status.changed"
+STATUS_VERSION_KEY = "status.version"
+
+# bumps the version and publishes it in one step, so the versions are published in order
+PUBLISH_STATUS_CHANGED = """
+local version = redis.call("INCR", KEYS[1])
+redis.call("PUBLISH", ARGV[1], version)
+return version
+"""
+
+
+def status_changed(rdb):
+    """
+    Tells the API the status changed, with a new version number. `rdb` can be a pipeline, to publish it
+    along with the change itself, or an async client, in which case the result must be awaited.
+    """
+    return rdb.eval(PUBLISH_STATUS_CHANGED, 1, STATUS_VERSION_KEY, STATUS_CHANNEL)
+
+
+def sleep_key(sleep_id: str) -> str:
+    """ Holds when a sleep ends, for display. """
+    return f"sleep.{sleep_id}"
 
 
-def sleep(sleep_id: str, seconds: int | float, poll_interval=0.2):
-    if seconds <= 0:
-        return
-    elif seconds < poll_interval:
-        time.sleep(seconds)
-        return
+def wake_channel(sleep_id: str) -> str:
+    return f"wake.{sleep_id}"
 
-    rdb = get_redis()
-    key = f"sleep.{sleep_id}"
-    ends_at = utcnow() + timedelta(seconds=seconds)
-    rdb.set(key, ends_at.isoformat(), px=int(seconds * 1000))
 
-    while rdb.get(key):
-        time.sleep(poll_interval)
+def wake(sleep_id: str):
+    """ Ends a ScanScheduler.sleep with the same id early. """
+    get_redis().publish(wake_channel(sleep_id), "wake")
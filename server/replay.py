@@ -0,0 +1,126 @@
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+
+from server.circular_buffer import CircularBuffer
+from server.logger import logger
+from server.models import CaptureHealth
+
+
+class ReplaySource:
+    """
+    Stands in for CaptureSupervisor without a sound card, feeding an audio file into a CircularBuffer in
+    capture-sized blocks, paced like a real stream.
+
+    `speed` 1 plays in real time and e.g. 4 four times as fast. Blocks are stamped with the wall clock as
+    they are written, like captured blocks, and with the file's own sample clock as their ADC time, so
+    `clock_drift_ppm` shows the speed-up. With `loop`, the file starts over when it ends.
+    """
+
+    def __init__(
+            self,
+            audio_buffer: CircularBuffer,
+            path: Path,
+            blocksize: int = 8192,
+            speed: float = 1.0,
+            loop: bool = True,
+    ):
+        if speed <= 0:
+            raise ValueError("Replay speed must be above 0")
+
+        self.audio_buffer = audio_buffer
+        self.path = path
+        self.blocksize = blocksize
+        self.speed = speed
+        self.loop = loop
+
+        self.stop_event = threading.Event()
+        self.finished = threading.Event()
+
+        self.running = False
+        self.restarts = 0  # times the file started over
+        self.callbacks = 0
+        self.last_error: str | None = None
+
+    def run(self):
+        try:
+            with sf.SoundFile(self.path) as audio_file:
+                if audio_file.samplerate != self.audio_buffer.sample_rate:
+                    raise ValueError(
+                        f"{self.path.name} is {audio_file.samplerate} Hz, the buffer is {self.audio_buffer.sample_rate} Hz"
+                    )
+
+                self._replay(audio_file)
+
+        except (sf.LibsndfileError, ValueError) as e:
+            self.last_error = str(e)
+            logger.warning(f"Replay error: {e}")
+
+        finally:
+            self.running = False
+            self.finished.set()
+
+    def _replay(self, audio_file: sf.SoundFile):
+        sample_rate = audio_file.samplerate
+        block = np.empty((self.blocksize, audio_file.channels), np.float32)
+        frames_played = 0
+        started_at = time.monotonic()
+
+        logger.info(f"Replaying {self.path.name} at {self.speed}x...")
+        self.running = True
+
+        while not self.stop_event.is_set():
+            frames = audio_file.read(out=block)
+            if len(frames) == 0:
+                if not self.loop:
+                    logger.info(f"Finished replaying {self.path.name}")
+                    return
+
+                audio_file.seek(0)
+                self.restarts += 1
+                continue
+
+            frames_played += len(frames)
+            due_at = started_at + frames_played / (sample_rate * self.speed)
+            if (wait := due_at - time.monotonic()) > 0 and self.stop_event.wait(wait):
+                return
+
+            self.audio_buffer.write(
+                self._to_storage(frames),
+                timestamp=time.time(),
+                adc_time=frames_played / sample_rate,
+            )
+            self.callbacks += 1
+
+    def _to_storage(self, frames: np.ndarray) -> np.ndarray:
+        """ Matches the buffer's channels and sample format, like a stream capturing in them would. """
+        channels = self.audio_buffer.channels
+        if frames.shape[1] != channels:
+            frames = np.repeat(frames.mean(axis=1, keepdims=True), channels, axis=1)
+
+        sample_format = self.audio_buffer.format
+        if sample_format.storage_dtype == np.float32:
+            return frames
+
+        full_scale = 2 ** (8 * sample_format.bytes_per_sample - 1)
+        samples = np.clip(np.round(frames * full_scale), -full_scale, full_scale - 1).astype(np.int32)
+        if sample_format.bytes_per_sample == 2:
+            return samples.astype(np.int16)
+
+        # packed little-endian 24-bit, the low 3 bytes of each int32
+        return np.ascontiguousarray(samples.view(np.uint8).reshape(len(frames), channels, 4)[:, :, :3]).reshape(len(frames), -1)
+
+    def stop(self):
+        self.stop_event.set()
+
+    def health(self) -> CaptureHealth:
+        return CaptureHealth(
+            running=self.running,
+            restarts=self.restarts,
+            callbacks=self.callbacks,
+            clock_drift_ppm=self.audio_buffer.clock_drift_ppm(),
+            last_error=self.last_error,
+        )
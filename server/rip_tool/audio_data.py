@@ -1,4 +1,5 @@
 import statistics
+import time
 from pathlib import Path
 from urllib.parse import urlparse
 
@@ -7,21 +8,96 @@ import numpy as np
 import soundfile
 from mutagen.flac import FLAC
 
-from server.config import env_config
+from server.audio_history import AudioHistory, history_dir
+from server.circular_buffer import CircularBuffer, BufferOverrun, attach_audio_buffer
+from server.config import env_config, file_config
 from server.logger import logger
+from server.models import HistoryEntry
 from server.utils import chunk_list, safe_filename
 
 
+def get_audio_chart(raw_audio: np.ndarray, parts: int):
+    """ RMS of each of `parts`, over every channel, the same as CircularBuffer.level_chart charts the ring. """
+    return [
+        float(np.sqrt(np.mean(np.square(chunk)))) if chunk.size else 0.0
+        for chunk in chunk_list(raw_audio, parts)
+    ]
+
+
 def get_audio_data_chart(file_path: Path, parts: int):
     with file_path.open("rb") as file:
         sf = soundfile.SoundFile(file)
         duration = sf.frames / sf.samplerate
         raw_audio = sf.read(sf.frames, always_2d=True)
 
-    return duration, [
-        np.percentile(np.abs(np.mean(chunk, axis=1)), 50)
-        for chunk in chunk_list(raw_audio, parts)
-    ]
+    return duration, get_audio_chart(raw_audio, parts)
+
+
+def get_buffer_audio_data_chart(entry: HistoryEntry, file_path: Path, parts: int):
+    """
+    Same as get_audio_data_chart, but charts the rip from the recorder buffer's block levels instead of
+    decoding the FLAC. Raises FileNotFoundError if the recorder isn't running, or BufferOverrun once the rip
+    has scrolled out of the buffer.
+    """
+    duration = soundfile.info(str(file_path)).duration
+    started_at, _ = get_entry_window(entry)
+
+    with attach_audio_buffer() as audio_buffer:
+        started_frame = audio_buffer.frame_at(started_at)
+        ended_frame = audio_buffer.frame_at(started_at + duration)
+        if started_frame < audio_buffer.frames_written - audio_buffer.capacity or ended_frame > audio_buffer.frames_written:
+            raise BufferOverrun("Rip is not in the buffer")
+
+        return duration, audio_buffer.level_chart(started_frame, ended_frame, parts)
+
+
+def get_entry_window(entry: HistoryEntry) -> tuple[float, float]:
+    """ Returns the (start, end) unix timestamps of a history entry's audio, padded by temp_save_offset. """
+    if entry.started_at and entry.track.duration_seconds:
+        started_at = entry.started_at.timestamp() - file_config.temp_save_offset
+        ended_at = started_at + entry.track.duration_seconds + 2 * file_config.temp_save_offset
+    else:
+        started_at = time.time() - file_config.buffer_length_seconds
+        ended_at = time.time()
+
+    return started_at, ended_at
+
+
+def read_window(audio_buffer: CircularBuffer, started_at: float, ended_at: float) -> np.ndarray:
+    """
+    Like CircularBuffer.slice_by_time, but audio that has already left the buffer is decoded from the
+    compressed audio history, if there is one. A gap between where the history ends and the buffer starts
+    (the recorder was down, or a chunk was pruned) is filled with silence, so the audio after it stays at
+    its place in time.
+    """
+    _, last_frame_time = audio_buffer.position()
+    buffer_started_at = last_frame_time - audio_buffer.capacity / audio_buffer.sample_rate
+
+    if started_at < buffer_started_at and history_dir.is_dir():
+        history = AudioHistory(history_dir).read(started_at, ended_at)
+        if history is not None and history[1] == audio_buffer.sample_rate and history[0].shape[1] == audio_buffer.channels:
+            older_audio, _, covered_until = history
+            if covered_until >= ended_at:
+                return older_audio
+
+            ring_started_at = max(covered_until, buffer_started_at)
+            gap_frames = round((ring_started_at - covered_until) * audio_buffer.sample_rate)
+            gap = np.zeros((gap_frames, audio_buffer.channels), np.float32)
+            return np.concatenate([older_audio, gap, audio_buffer.slice_by_time(ring_started_at, ended_at)])
+
+    return audio_buffer.slice_by_time(started_at, ended_at)
+
+
+def save_temp_audio(entry: HistoryEntry, audio_buffer: CircularBuffer) -> Path:
+    """ Writes a history entry's audio from the buffer to a temporary FLAC, for the rip tool to edit. """
+    started_at, ended_at = get_entry_window(entry)
+    audio_data = read_window(audio_buffer, started_at, ended_at)
+
+    song_path = env_config.appdata_dir / "temp" / f"{entry.entry_id}.flac"
+    song_path.parent.mkdir(parents=True, exist_ok=True)
+    soundfile.write(song_path, audio_data, audio_buffer.sample_rate, format="FLAC")
+
+    return song_path
 
 
 def get_image_extension_from_url(url: str) -> str:
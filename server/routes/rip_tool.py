@@ -7,12 +7,18 @@ from starlette.requests import Request
 from starlette.responses import FileResponse
 
 from server.auth import is_admin
+from server.circular_buffer import BufferOverrun, attach_audio_buffer
 from server.config import env_config
 from server.db import get_history_entry, update_history_entries
 from server.exceptions import ErrorResponse
 from server.models import HistoryEntry, ResponseModel, BaseModel
-from server.redis_client import get_redis
-from server.rip_tool.audio_data import get_audio_data_chart, trim_and_save_audio, get_image_extension_from_url
+from server.rip_tool.audio_data import (
+    get_audio_data_chart,
+    get_buffer_audio_data_chart,
+    trim_and_save_audio,
+    get_image_extension_from_url,
+    save_temp_audio,
+)
 from server.utils import safe_filename
 
 
@@ -64,19 +70,18 @@ def start_rip(request: Request, entry_id: str) -> ResponseModel:
     if entry is None:
         return ResponseModel(success=False, status="not_found")
 
-    rdb = get_redis()
-    rdb.publish("save", str(entry.entry_id))
+    try:
+        with attach_audio_buffer() as audio_buffer:
+            song_path = save_temp_audio(entry, audio_buffer)
+    except FileNotFoundError:
+        raise ErrorResponse(code=503, status="recorder_unavailable", message="Audio buffer not available")
 
-    ps = rdb.pubsub()
-    ps.subscribe(str(entry.entry_id))
-    ps.get_message(timeout=1)
-    resp = ps.get_message(timeout=10)
+    update_history_entries(
+        dict(entry_id=entry.entry_id),
+        saved_temp_buffer=True
+    )
 
-    if resp is None:
-        raise ErrorResponse(code=500, status="timed_out")
-    else:
-        resp = ResponseModel.model_validate_json(resp["data"])
-        return resp
+    return ResponseModel(success=True, message="Saved temp song", data=song_path.absolute())
 
 
 @api.get("/{entry_id}")
@@ -113,6 +118,17 @@ async def get_audio_data(entry_id: str, request: Request) -> AudioDataResponse:
     if not file_path.is_file():
         raise ErrorResponse(code=404, status="rip_not_found", message="Audio buffer not found")
 
+    entry = get_history_entry(entry_id)
+    if entry and entry.started_at and entry.track.duration_seconds:
+        try:
+            # while the rip is still in the recorder's buffer, skip decoding the FLAC
+            duration, vol_chart = await asyncio.to_thread(
+                get_buffer_audio_data_chart, entry, file_path, req.chart_parts
+            )
+            return AudioDataResponse(duration=duration, chart=vol_chart)
+        except (FileNotFoundError, BufferOverrun):
+            pass
+
     loop = asyncio.get_event_loop()
     duration, vol_chart = await loop.run_in_executor(pool, get_audio_data_chart, file_path, req.chart_parts)
 
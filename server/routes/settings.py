@@ -1,6 +1,7 @@
 import asyncio
 from concurrent.futures.process import ProcessPoolExecutor
 from pathlib import Path
+from typing import Literal
 import argon2
 from fastapi import APIRouter
 from pydantic import computed_field
@@ -34,12 +35,25 @@ class UpdateSettingsRequest(BaseModel):
 
     duration: int | None = None
     silence_threshold: float | None = None
+    adaptive_silence_threshold: bool | None = None
+    noise_floor_seconds: int | None = None
+    music_detection: bool | None = None
+    change_detection: bool | None = None
+    local_confirm_seconds: int | None = None
 
     buffer_length_seconds: int | None = None
+    buffer_dtype: Literal["float32", "int16", "int24"] | None = None
+    buffer_storage: Literal["memory", "disk"] | None = None
+    history_length_seconds: int | None = None
+    history_chunk_seconds: int | None = None
+    history_format: Literal["flac", "opus", "vorbis"] | None = None
     temp_save_offset: int | None = None
 
     last_fm_key: str | None = None
     music_id_plugin: str | None = None
+    music_id_plugins: list[str] | None = None
+    music_id_plugin_options: dict[str, dict] | None = None
+    music_id_workers: int | None = None
 
     admin_username: str | None = None
     old_password: str | None = None
@@ -106,4 +120,6 @@ def get_music_id_plugins(request: Request):
 
     plugins_dir = Path(__file__).parent.parent / "music_id" / "plugins"
     plugins = [plugin.stem for plugin in plugins_dir.glob("*")]
-    return [plugin for plugin in plugins if not plugin.startswith("__")]    
+    # the stub answers from a script for load testing, so it's only offered while replaying a recording
+    hidden = set() if env_config.replay_file else {"stub"}
+    return [plugin for plugin in plugins if not plugin.startswith("__") and plugin not in hidden]
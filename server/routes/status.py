@@ -1,53 +1,101 @@
 import asyncio
-import threading
 from contextlib import asynccontextmanager
 from datetime import datetime
 
 from fastapi import FastAPI
 from fastapi.routing import APIRouter
+from pydantic import TypeAdapter
 from redis import Redis, RedisError
 from starlette.requests import Request
 from starlette.websockets import WebSocket
 
 from server.config import env_config
 from server.logger import logger
-from server.models import StatusResponse
-from server.redis_client import get_redis
+from server.models import StatusResponse, CaptureHealth, MusicActivity, PluginHealth
+from server.redis_client import STATUS_CHANNEL, get_async_redis, get_redis
 from server.websockets import ConnectionManager
 
 ws_manager = ConnectionManager()
+plugin_health_adapter = TypeAdapter(list[PluginHealth])
 
+STATUS_KEYS = (
+    "now_playing", "rms", "message", "recorded_at", "sleep.next_scan", "now_scanning", "capture", "activity", "plugins",
+)
 
-def push_status_updates(stop_event, _ws_manager: ConnectionManager, loop: asyncio.BaseEventLoop):
-    rdb = get_redis()
-    last_status = None
-    while True:
-        if stop_event.is_set():
-            break
 
+class StatusBroadcaster:
+    """
+    Rebuilds the status when the recorder publishes that it changed, and sends it to every websocket client,
+    serialized once. Keys expiring publish nothing, so without events the status is still rebuilt every
+    `refresh_seconds`.
+    """
+
+    refresh_seconds = 5
+
+    def __init__(self, _ws_manager: ConnectionManager):
+        self.ws_manager = _ws_manager
+        self.version: int | None = None  # of the last status change published
+        self.status_json: str | None = None  # the status last sent, for new clients
+
+        self._changed = asyncio.Event()
+
+    async def run(self):
+        listener = asyncio.create_task(self._listen())
         try:
-            status = get_status(rdb)
-            if status != last_status:
-                last_status = status
-                asyncio.run_coroutine_threadsafe(_ws_manager.broadcast(status.model_dump_json()), loop)
-        except RedisError:
-            rdb = get_redis()
-        except Exception as e:
-            logger.error(e)
+            while True:
+                try:
+                    async with asyncio.timeout(self.refresh_seconds):
+                        await self._changed.wait()
+                except TimeoutError:
+                    pass
+
+                # changes published while this rebuilds are all picked up by the next one
+                self._changed.clear()
+                try:
+                    await self.refresh()
+                except RedisError as e:
+                    logger.warning(f"Couldn't get the status: {e}")
+                except Exception as e:
+                    logger.error(e)
+
+        finally:
+            listener.cancel()
+
+    async def refresh(self):
+        status_json = (await asyncio.to_thread(get_status)).model_dump_json()
+        if status_json != self.status_json:
+            self.status_json = status_json
+            await self.ws_manager.broadcast(status_json)
+
+    async def _listen(self):
+        while True:
+            pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(STATUS_CHANNEL)
+                self._changed.set()  # whatever changed while not subscribed
+
+                async for message in pubsub.listen():
+                    version = int(message["data"])
+                    if version != self.version:
+                        self.version = version
+                        self._changed.set()
+
+            except RedisError as e:
+                logger.warning(f"Lost the status channel: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+status_broadcaster = StatusBroadcaster(ws_manager)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    stop_trigger = threading.Event()
-    status_push_thread = threading.Thread(
-        target=push_status_updates,
-        args=(stop_trigger, ws_manager, asyncio.get_event_loop()),
-        daemon=True
-    )
-    status_push_thread.start()
+    broadcaster_task = asyncio.create_task(status_broadcaster.run())
     yield
-    stop_trigger.set()
-    status_push_thread.join()  # wait for status loop to stop gracefully
+    broadcaster_task.cancel()
+    await asyncio.gather(broadcaster_task, return_exceptions=True)
     ws_manager.close()
 
 
@@ -57,21 +105,28 @@ api = APIRouter(prefix="/api/status", lifespan=lifespan)
 def get_status(rdb: Redis = None) -> StatusResponse | None:
     rdb = get_redis() if rdb is None else rdb
 
-    playing_raw = rdb.get("now_playing")
+    # one round trip for the whole status
+    (
+        playing_raw, rms_raw, message, recorded_at, next_scan, scan_ends, capture_raw, activity_raw, plugins_raw
+    ) = rdb.mget(STATUS_KEYS)
+
     if playing_raw:
         resp = StatusResponse.model_validate_json(playing_raw)
-        resp.rms = float(rms_raw) if (rms_raw := rdb.get("rms")) else None
+        resp.rms = float(rms_raw) if rms_raw else None
 
     else:
         resp = StatusResponse(
             success=False,
-            message=rdb.get("message") or "",
-            recorded_at=datetime.fromisoformat(rdb.get("recorded_at")) if rdb.exists("recorded_at") else None,
-            rms=float(rms_raw) if (rms_raw := rdb.get("rms")) else None
+            message=message or "",
+            recorded_at=datetime.fromisoformat(recorded_at) if recorded_at is not None else None,
+            rms=float(rms_raw) if rms_raw else None
         )
 
-    resp.next_scan = datetime.fromisoformat(rdb.get("sleep.next_scan")) if rdb.exists("sleep.next_scan") else None
-    resp.scan_ends = datetime.fromisoformat(rdb.get("now_scanning")) if rdb.exists("now_scanning") else None
+    resp.next_scan = datetime.fromisoformat(next_scan) if next_scan is not None else None
+    resp.scan_ends = datetime.fromisoformat(scan_ends) if scan_ends is not None else None
+    resp.capture = CaptureHealth.model_validate_json(capture_raw) if capture_raw else None
+    resp.activity = MusicActivity.model_validate_json(activity_raw) if activity_raw else None
+    resp.plugins = plugin_health_adapter.validate_json(plugins_raw) if plugins_raw else None
 
     return resp
 
@@ -94,6 +149,9 @@ async def get_websocket_host(request: Request, scheme: str) -> str:
 async def get_live_status(websocket: WebSocket):
     await ws_manager.connect(websocket)
     try:
+        if status_broadcaster.status_json:
+            await websocket.send_text(status_broadcaster.status_json)
+
         while True:
             await websocket.receive()
     except:
@@ -0,0 +1,91 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from server.redis_client import get_async_redis, sleep_key, status_changed, wake_channel
+
+
+class ScanScheduler:
+    """
+    When the recorder scans next. The music id loop waits for the next scan with `sleep()`, and `wake()` or
+    `schedule()` move it while it waits, from any thread, e.g. when the audio changes abruptly.
+
+    While it sleeps, the time of the next scan is kept in Redis under `sleep.<sleep_id>` for the status, and
+    `redis_client.wake(sleep_id)` (as `/api/scan-now` does) wakes it from other processes.
+    """
+
+    def __init__(self, sleep_id: str = "next_scan"):
+        self.key = sleep_key(sleep_id)
+        self.channel = wake_channel(sleep_id)
+        self.next_scan_at: float | None = None  # unix time, while sleeping
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._moved = asyncio.Event()
+
+    async def sleep(self, seconds: float):
+        """ Returns when the next scan is due, `seconds` from now unless it's moved in the meantime. """
+        if seconds <= 0:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._moved.clear()
+        self.next_scan_at = time.time() + seconds
+
+        rdb = get_async_redis()
+        pubsub = rdb.pubsub(ignore_subscribe_messages=True)
+        listener = None
+        try:
+            await pubsub.subscribe(self.channel)  # before the key is set, so no wake can be missed
+            listener = asyncio.create_task(self._listen(pubsub))
+            await self._publish(rdb)
+
+            while (remaining := self.next_scan_at - time.time()) > 0:
+                try:
+                    async with asyncio.timeout(remaining):
+                        await self._moved.wait()
+                except TimeoutError:
+                    break
+
+                self._moved.clear()
+                await self._publish(rdb)
+
+        finally:
+            self.next_scan_at = None
+            if listener:
+                listener.cancel()
+            await asyncio.shield(self._clear(rdb, pubsub))
+
+    def schedule(self, seconds: float):
+        """ Moves the next scan to `seconds` from now, if the scheduler is sleeping. """
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._move, time.time() + seconds)
+
+    def wake(self):
+        """ Scans now, if the scheduler is sleeping. """
+        self.schedule(0)
+
+    def _move(self, scan_at: float):
+        if self.next_scan_at is not None:
+            self.next_scan_at = scan_at
+            self._moved.set()
+
+    async def _listen(self, pubsub):
+        async for _ in pubsub.listen():
+            self._move(time.time())
+
+    async def _publish(self, rdb):
+        if (remaining := self.next_scan_at - time.time()) > 0:
+            scan_at = datetime.fromtimestamp(self.next_scan_at, timezone.utc)
+            async with rdb.pipeline() as pipe:
+                pipe.set(self.key, scan_at.isoformat(), px=max(1, int(remaining * 1000)))
+                status_changed(pipe)
+                await pipe.execute()
+
+    async def _clear(self, rdb, pubsub):
+        try:
+            async with rdb.pipeline() as pipe:
+                pipe.delete(self.key)
+                status_changed(pipe)
+                await pipe.execute()
+        finally:
+            await pubsub.aclose()
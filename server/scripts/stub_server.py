@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+A local stand-in for the identification service and Last.fm, answering from a script, so the recorder can
+be load tested end to end without the network.
+
+    python server/scripts/stub_server.py script.yaml --port 8765
+
+The script is a StubScript (see server/music_id/plugins/stub.py) as YAML, e.g.
+
+    latency_seconds: 0.8
+    failure_rate: 0.05
+    responses:
+      - track: {track_id: "1", track_name: Song, artist_name: Artist, album_name: Album, offset: 12, duration_seconds: 200}
+        repeat: 6
+      - track: null
+        repeat: 2
+
+Then point the recorder at it, with a recording in place of the sound card. The stub plugin is only listed
+in the settings when the server also has REPLAY_FILE set, otherwise choose it in config.yaml:
+
+    music_id_plugins: [stub]                                    # config.yaml
+    music_id_plugin_options: {stub: {url: "http://127.0.0.1:8765"}}
+
+    LAST_FM_URL=http://127.0.0.1:8765/2.0 REPLAY_FILE=mix.flac REPLAY_SPEED=1 python server/background/sound.py
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+import uvicorn
+import yaml
+from fastapi import FastAPI, HTTPException, Request
+
+# Add the server directory to the path so we can import modules
+server_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(server_dir.parent))
+
+from server.models import MusicIdResult, MusicIdTrack
+from server.music_id.plugins.stub import StubPlayer, StubScript
+
+
+def create_app(script: StubScript, last_fm_latency_seconds: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    player = StubPlayer(script)
+
+    tracks: dict[str, MusicIdTrack] = {}
+    for response in script.responses:
+        if response.track:
+            tracks.setdefault(response.track.track_name.lower(), response.track)
+
+    @app.post("/identify")
+    async def identify(request: Request) -> MusicIdResult:
+        await request.body()  # like a real service, take the whole upload before answering
+        try:
+            return await player.answer()
+        except RuntimeError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+
+    @app.post("/2.0")
+    async def last_fm(method: str, artist: str = "", track: str = "", album: str = "") -> dict:
+        await asyncio.sleep(last_fm_latency_seconds)
+        method = method.lower()
+
+        if method == "track.getinfo" and (found := tracks.get(track.lower())):
+            return {"track": {
+                "name": found.track_name,
+                "url": f"https://www.last.fm/music/{found.artist_name}/_/{found.track_name}",
+                "duration": int((found.duration_seconds or 0) * 1000),
+                "artist": {"name": found.artist_name},
+                "album": {"title": found.album_name} if found.album_name else {},
+            }}
+
+        elif method == "artist.getinfo" and artist:
+            return {"artist": {"name": artist, "url": f"https://www.last.fm/music/{artist}"}}
+
+        elif method == "album.getinfo" and album:
+            album_tracks = [found for found in tracks.values() if (found.album_name or "").lower() == album.lower()]
+            return {"album": {
+                "name": album,
+                "artist": artist,
+                "tracks": {"track": [
+                    {"name": found.track_name, "@attr": {"rank": found.track_no or i + 1}}
+                    for i, found in enumerate(album_tracks)
+                ]},
+            }}
+
+        return {"error": 6, "message": "Not found"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("script", type=Path)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--last-fm-latency", type=float, default=0.0, help="seconds before each Last.fm answer")
+    args = parser.parse_args()
+
+    script = StubScript.model_validate(yaml.safe_load(args.script.read_text()) or {})
+    uvicorn.run(create_app(script, args.last_fm_latency), host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -61,6 +61,12 @@ def normalize(raw: np.array):
     return 2 * (raw - raw.min()) / (raw.max() - raw.min()) - 1
 
 
+def rms(raw: np.array) -> float:
+    # dot product instead of mean(raw ** 2), so no temporary array is allocated
+    flat = raw.reshape(-1)
+    return float(np.sqrt(np.dot(flat, flat) / flat.size)) if flat.size else 0.0
+
+
 def is_local_client(request: Request):
     x_forwarded_for = request.headers.get("x-forwarded-for")
     if x_forwarded_for: